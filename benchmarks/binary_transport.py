@@ -0,0 +1,76 @@
+"""
+Payload size and encode time of arrays and tables exported as binary
+(typed-array chunks) versus plain JSON number arrays.
+
+Usage: python benchmarks/binary_transport.py [--repeat 5]
+"""
+
+import argparse
+import json
+import time
+
+import numpy
+import pandas
+
+from magneton.core.widget import WidgetModel
+
+
+def make_payloads():
+    rng = numpy.random.default_rng(0)
+    payloads = {}
+    for n in (10**4, 10**5, 10**6):
+        payloads[f"float64 x {n:.0e}"] = rng.random(n)
+        payloads[f"int64 x {n:.0e}"] = rng.integers(0, 10**6, n)
+
+    n = 10**5
+    payloads[f"edge list x {n:.0e}"] = pandas.DataFrame(
+        {
+            "source": rng.integers(0, 10**4, n),
+            "target": rng.integers(0, 10**4, n),
+            "weight": rng.random(n),
+        }
+    )
+    return payloads
+
+
+def encode_json(value):
+    if isinstance(value, pandas.DataFrame):
+        value = {name: value[name].tolist() for name in value.columns}
+    else:
+        value = value.tolist()
+    return json.dumps(value)
+
+
+def encode_binary(value):
+    return json.dumps(WidgetModel.export(WidgetModel.dict({"value": value})))
+
+
+def measure(encode, value, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        encoded = encode(value)
+        times.append(time.perf_counter() - start)
+    return len(encoded), min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(
+        f"{'payload':<24}{'json (KB)':>12}{'binary (KB)':>14}"
+        f"{'json (ms)':>12}{'binary (ms)':>14}"
+    )
+    for name, value in make_payloads().items():
+        json_size, json_time = measure(encode_json, value, args.repeat)
+        binary_size, binary_time = measure(encode_binary, value, args.repeat)
+        print(
+            f"{name:<24}{json_size / 1024:>12.0f}{binary_size / 1024:>14.0f}"
+            f"{json_time * 1e3:>12.1f}{binary_time * 1e3:>14.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
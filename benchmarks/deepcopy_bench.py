@@ -0,0 +1,95 @@
+"""
+Micro-benchmark of magneton.utils.deepcopy against copy.deepcopy and the
+previous recursive implementation.
+
+Usage: python benchmarks/deepcopy_bench.py [--repeat 5]
+"""
+
+import argparse
+import copy
+import sys
+import time
+
+from magneton.utils.deepcopy import deepcopy
+
+
+def legacy_deepcopy(x, replacer=None):
+    """
+    The previous recursive, generator-based implementation
+    """
+    if replacer:
+        x = replacer(x)
+    if isinstance(x, list):
+        return list(legacy_deepcopy(y) for y in x)
+    if isinstance(x, tuple):
+        return tuple(legacy_deepcopy(y) for y in x)
+    if isinstance(x, dict):
+        return dict((legacy_deepcopy(k), legacy_deepcopy(v)) for k, v in x.items())
+    if isinstance(x, set):
+        return set(legacy_deepcopy(y) for y in x)
+    if isinstance(x, frozenset):
+        return frozenset(legacy_deepcopy(y) for y in x)
+    if isinstance(x, (str, int, float, complex, bool)):
+        return x
+    if x is None:
+        return x
+    raise TypeError()
+
+
+def make_shapes():
+    deep = leaf = {}
+    for _ in range(5000):
+        leaf["child"] = {}
+        leaf = leaf["child"]
+
+    shapes = {
+        "wide dict (1e5 keys)": {f"key_{i}": i for i in range(100000)},
+        "list of 1e6 ints": list(range(1000000)),
+        "list of 1e5 records": [
+            {"id": i, "label": f"node {i}", "tags": ["a", "b"]} for i in range(100000)
+        ],
+        "deep nesting (5000)": deep,
+    }
+
+    try:
+        import numpy
+
+        shapes["ndarray (1e6 float64)"] = {"values": numpy.arange(1e6)}
+    except ImportError:
+        pass
+
+    return shapes
+
+
+def measure(fn, value, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        try:
+            fn(value)
+        except (RecursionError, TypeError) as e:
+            return type(e).__name__
+        times.append(time.perf_counter() - start)
+    return f"{min(times) * 1e3:.1f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    implementations = {
+        "magneton": deepcopy,
+        "copy.deepcopy": copy.deepcopy,
+        "legacy": legacy_deepcopy,
+    }
+
+    print(f"recursion limit: {sys.getrecursionlimit()}")
+    print(f"{'shape':<24}" + "".join(f"{name:>16}" for name in implementations))
+    for name, value in make_shapes().items():
+        results = [measure(fn, value, args.repeat) for fn in implementations.values()]
+        print(f"{name:<24}" + "".join(f"{r:>16}" for r in results))
+
+
+if __name__ == "__main__":
+    main()
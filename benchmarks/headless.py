@@ -0,0 +1,116 @@
+"""
+Headless client for benchmarks: mounts a widget's component in an idom Layout
+(as one notebook output would) and plays the part of the frontend, without
+Jupyter or a browser. Renders produce the wrapper props the frontend would
+receive, and events are delivered to the widget's "message" handler.
+
+Used by suite.py and load.py; not meant to be run directly.
+"""
+
+import os
+from typing import Any, Dict, Optional
+
+from idom.core.layout import Layout, LayoutEvent
+
+from magneton.core import idom_loader
+
+
+def missing_bundle() -> Optional[str]:
+    """
+    Returns the path of the JS bundle if it has not been built, in which case
+    components cannot be mounted
+    """
+    path = idom_loader.BUNDLE_PATH
+    return None if os.path.exists(path) else path
+
+
+def wrapper_props(vdom) -> Optional[Dict[str, Any]]:
+    """
+    Returns the wrapperProps of the first widget element in a VDOM tree
+    """
+    stack = [vdom]
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, dict):
+            continue
+        props = node.get("attributes", {}).get("wrapperProps")
+        if props is not None:
+            return props
+        stack.extend(reversed(node.get("children", [])))
+    return None
+
+
+class HeadlessClient:
+    """
+    One mounted component of a widget:
+
+        async with HeadlessClient(widget) as client:
+            widget.send_message("hello", 1)
+            props = await client.render()
+            await client.ack()
+    """
+
+    def __init__(self, widget):
+        self.widget = widget
+        self.client_id: Optional[str] = None
+        self.props: Optional[Dict[str, Any]] = None
+        self.renders = 0
+        self.received = 0
+        self.model_version: Optional[int] = None
+        # Seq of the last message received, and of the last one acknowledged
+        self.last_seq = 0
+        self.__acked = 0
+        self.__layout = Layout(widget.component())
+
+    async def __aenter__(self):
+        path = missing_bundle()
+        if path is not None:
+            raise FileNotFoundError(f"build the JS bundle first: {path}")
+        await self.__layout.__aenter__()
+        await self.render()
+        # The first render only mounts the component; it starts reading
+        # messages (and observing the model) from its effects
+        self.client_id = self.props["clientId"]
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.__layout.__aexit__(*exc)
+
+    async def render(self) -> Dict[str, Any]:
+        """
+        Wait for the next render of the component and return its props
+        """
+        update = await self.__layout.render()
+        props = wrapper_props(update.new)
+        if props is not None:
+            self.props = props
+            self.renders += 1
+            self.received += len(props["messages"])
+            if props["messages"]:
+                self.last_seq = props["messages"][-1]["seq"]
+            self.model_version = props["modelVersion"]
+        return self.props
+
+    async def send(self, type: str, payload: Any):
+        """
+        Send a message to the widget, as the frontend does
+        """
+        await self.__layout.deliver(
+            LayoutEvent(target="message", data=[type, payload, self.client_id])
+        )
+
+    async def ack(self):
+        """
+        Acknowledge every message received so far
+        """
+        if self.last_seq > self.__acked:
+            self.__acked = self.last_seq
+            await self.send("message_ack", self.__acked)
+
+    async def update_model(self, path, value):
+        await self.send("update_model", {"path": path, "value": value})
+
+    async def call_func(self, path, args, return_id: str):
+        await self.send(
+            "call_func", {"path": path, "args": args, "returnId": return_id}
+        )
@@ -0,0 +1,117 @@
+"""
+Memory curve of StatefulWidgetBase history over many recorded actions on a
+large state, compared with storing a full deep copy per action.
+
+Usage: python benchmarks/history_memory.py [--actions 1000] [--nodes 100000]
+                                           [--baseline]
+
+The deep copy baseline is opt-in since it needs O(state size x actions) memory.
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+
+from magneton.core.widget.StatefulWidgetBase import StatefulWidgetBase
+from magneton.core.widget import WidgetModel
+from magneton.utils.deepcopy import deepcopy
+
+
+def make_state(n_nodes):
+    return {
+        "data": {
+            "nodes": [{"id": i, "count": i % 97} for i in range(n_nodes)],
+            "relations": {f"rel_{i}": {"count": i} for i in range(n_nodes // 10)},
+        },
+        "event_element": None,
+        "event_component": None,
+    }
+
+
+def mutate(state, rng: random.Random, n_nodes):
+    # A typical action touches a handful of leaves
+    state.data.relations[f"rel_{rng.randrange(n_nodes // 10)}"] = {
+        "count": rng.random()
+    }
+    state.event_element = rng.randrange(n_nodes)
+
+
+def run_structural(n_actions, n_nodes, every):
+    rng = random.Random(0)
+    base = StatefulWidgetBase("Benchmark")
+    base.state = make_state(n_nodes)
+
+    tracemalloc.start()
+    start_mem = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    curve = []
+    for i in range(1, n_actions + 1):
+        mutate(base.state, rng, n_nodes)
+        base.push_state(action={"name": "mutate", "args": (), "kwargs": {}})
+        if i % every == 0:
+            curve.append((i, tracemalloc.get_traced_memory()[0] - start_mem))
+    push_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(100):
+        base.pop_state(rng.randrange(n_actions))
+    pop_time = (time.perf_counter() - start) / 100
+    tracemalloc.stop()
+
+    return curve, push_time / n_actions, pop_time
+
+
+def run_deepcopy(n_actions, n_nodes, every):
+    rng = random.Random(0)
+    base = StatefulWidgetBase("Benchmark")
+    base.state = make_state(n_nodes)
+    history = []
+
+    tracemalloc.start()
+    start_mem = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    curve = []
+    for i in range(1, n_actions + 1):
+        mutate(base.state, rng, n_nodes)
+        history.append({"state": deepcopy(base.state, replacer=WidgetModel.unproxy)})
+        if i % every == 0:
+            curve.append((i, tracemalloc.get_traced_memory()[0] - start_mem))
+    push_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(100):
+        base.state = deepcopy(history[rng.randrange(n_actions)]["state"])
+    pop_time = (time.perf_counter() - start) / 100
+    tracemalloc.stop()
+
+    return curve, push_time / n_actions, pop_time
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--actions", type=int, default=1000)
+    parser.add_argument("--nodes", type=int, default=100000)
+    parser.add_argument("--every", type=int, default=100)
+    parser.add_argument("--baseline", action="store_true")
+    args = parser.parse_args()
+
+    results = {"structural": run_structural(args.actions, args.nodes, args.every)}
+    if args.baseline:
+        results["deepcopy"] = run_deepcopy(args.actions, args.nodes, args.every)
+
+    print(f"{'actions':>8} " + " ".join(f"{name + ' (MB)':>16}" for name in results))
+    curves = [curve for curve, _, _ in results.values()]
+    for points in zip(*curves):
+        print(
+            f"{points[0][0]:>8} "
+            + " ".join(f"{mem / 2**20:>16.1f}" for _, mem in points)
+        )
+
+    print()
+    for name, (_, push, pop) in results.items():
+        print(f"{name:>10}: push {push * 1e3:.3f} ms, pop {pop * 1e3:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Session resume from a history file (see StatefulWidgetBase.save_history):
+size of the file, time to save a long history, time for a fresh widget to
+load it (which only reads the index and restores the last state), time to
+open a HistoryView on it (which decodes no state) and latency of pop_state
+on random entries of the loaded history.
+
+Usage: python benchmarks/history_persistence.py [--entries 10000]
+                                                [--nodes 100000]
+                                                [--keyframe-interval 128]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from magneton.core.widget import HistoryView
+from magneton.core.widget.StatefulWidgetBase import StatefulWidgetBase
+
+
+def make_widget(n_entries, n_nodes):
+    rng = random.Random(0)
+    widget = StatefulWidgetBase("Benchmark")
+    widget.state = {
+        "data": {"nodes": [{"id": i, "count": 0} for i in range(n_nodes)]},
+        "filters": {"min_count": 0, "labels": []},
+        "selected": None,
+    }
+
+    for _ in range(n_entries):
+        widget.state.selected = rng.randrange(n_nodes)
+        widget.state.filters.min_count = rng.randrange(10)
+        widget.push_state(action={"name": "mutate", "args": (), "kwargs": {}})
+    return widget
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=10000)
+    parser.add_argument("--nodes", type=int, default=100000)
+    parser.add_argument("--keyframe-interval", type=int, default=128)
+    args = parser.parse_args()
+
+    widget = make_widget(args.entries, args.nodes)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "history.bin")
+
+        start = time.perf_counter()
+        widget.save_history(path, keyframe_interval=args.keyframe_interval)
+        save_time = time.perf_counter() - start
+        widget.history.close()
+        size = os.path.getsize(path) + os.path.getsize(path + ".idx")
+
+        start = time.perf_counter()
+        resumed = StatefulWidgetBase("Benchmark")
+        resumed.load_history(path)
+        load_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        view = HistoryView(resumed)
+        view_time = time.perf_counter() - start
+
+        rng = random.Random(1)
+        latencies = []
+        for _ in range(100):
+            i = rng.randrange(args.entries)
+            start = time.perf_counter()
+            resumed.pop_state(i)
+            latencies.append(time.perf_counter() - start)
+        view.dispose()
+        resumed.history.close()
+
+    latencies.sort()
+    print(f"entries: {args.entries}, nodes: {args.nodes}")
+    print(f"file size:          {size / 1e6:10.2f} MB")
+    print(f"save:               {save_time * 1e3:10.1f} ms")
+    print(f"load (resume):      {load_time * 1e3:10.1f} ms")
+    print(f"open HistoryView:   {view_time * 1e3:10.1f} ms")
+    print(f"pop_state p50:      {statistics.median(latencies) * 1e3:10.2f} ms")
+    print(f"pop_state p99:      {latencies[98] * 1e3:10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Import time of the package and its subsystems, each measured in fresh
+interpreters, and the heavy dependencies that `import magneton` loads (there
+should be none). Every module of magneton.utils is also imported on its own
+in a fresh interpreter, which catches import cycles. Exits with status 1 if
+`import magneton` takes longer than --max-ms or loads a heavy dependency, or
+if a utils module fails to import, to guard against regressions.
+
+Usage: python benchmarks/import_time.py [--repeat 10] [--max-ms 50]
+"""
+
+import argparse
+import importlib.util
+import json
+import pkgutil
+import statistics
+import subprocess
+import sys
+
+STATEMENTS = [
+    "import magneton",
+    "import magneton.helpers",
+    "import magneton.core.widget",
+    "from magneton import PlaceHolder",
+]
+
+# Dependencies that `import magneton` must not load
+HEAVY_MODULES = [
+    "idom",
+    "idom_jupyter",
+    "colorama",
+    "requests",
+    "pkg_resources",
+    "numpy",
+    "pandas",
+]
+
+_MEASURE = """
+import json, sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(json.dumps([elapsed, [m for m in {heavy!r} if m in sys.modules]]))
+"""
+
+
+def measure(statement):
+    """
+    Returns the time taken by statement in a fresh interpreter and the heavy
+    modules loaded by it, or raises RuntimeError if it failed
+    """
+    process = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            _MEASURE.format(statement=statement, heavy=HEAVY_MODULES),
+        ],
+        capture_output=True,
+        text=True,
+    )
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr.strip().splitlines()[-1])
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def utils_modules():
+    """
+    Names of the modules of magneton.utils
+    """
+    spec = importlib.util.find_spec("magneton.utils")
+    return [
+        f"magneton.utils.{module.name}"
+        for module in pkgutil.iter_modules(spec.submodule_search_locations)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    print(f"{'statement':<36}{'median (ms)':>13}{'min (ms)':>10}  heavy modules")
+    failed = False
+    for statement in STATEMENTS:
+        try:
+            samples = [measure(statement) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(f"{statement:<36}  {e}")
+            continue
+
+        times = [elapsed * 1e3 for elapsed, _ in samples]
+        heavy = samples[0][1]
+        median = statistics.median(times)
+        print(
+            f"{statement:<36}{median:>13.1f}{min(times):>10.1f}  "
+            f"{', '.join(heavy) or '-'}"
+        )
+        if statement == "import magneton" and (median > args.max_ms or heavy):
+            failed = True
+
+    if failed:
+        print(f"\n`import magneton` is over {args.max_ms} ms or loads heavy modules")
+
+    print()
+    broken = []
+    for module in utils_modules():
+        try:
+            measure(f"import {module}")
+        except RuntimeError as e:
+            broken.append(module)
+            print(f"{'import ' + module:<36}  {e}")
+    if broken:
+        print(f"\n{len(broken)} utils modules fail to import on their own")
+    else:
+        print("every utils module imports on its own")
+
+    if failed or broken:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
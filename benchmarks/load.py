@@ -0,0 +1,295 @@
+"""
+Load harness: mounts N headless clients (see headless.py) on one widget and
+replays a chatty frontend against it, without Jupyter or a browser. Each
+client sends update_model and call_func events at a target rate, renders
+through its own idom Layout and acknowledges the messages it receives, as
+the frontend does. The widget also broadcasts messages to every client.
+
+For each N the harness reports:
+- end-to-end latency of update_model (until every other client rendered the
+  change) and of call_func (until the caller received the result)
+- renders per second, summed over clients
+- message queue depth (messages kept in the widget's log, at most and on
+  average)
+- peak resident memory of the process
+
+Usage: python benchmarks/load.py [--clients 1,10,50,100] [--rate 20]
+                                 [--duration 5] [--broadcast 10]
+                                 [--replay FILE | --record FILE]
+
+Streams are JSON lines of {"t": seconds, "client": i, "type": ..., "payload":
+...}; --record saves the synthetic stream for the largest N instead of
+running it, and --replay runs a saved (or captured) stream, mapping clients
+onto the N mounted ones.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import resource
+import sys
+import time
+from typing import Dict, List
+
+from magneton.core.widget import WidgetModel
+from magneton.core.widget.StatefulWidgetBase import StatefulWidgetBase
+from magneton.utils import metrics
+
+from headless import HeadlessClient
+
+
+def make_widget(n_nodes):
+    widget = StatefulWidgetBase(
+        "LoadTest",
+        model={
+            "state": {
+                "data": {"nodes": [{"id": i, "count": 0} for i in range(n_nodes)]},
+                "filters": {"min_count": 0},
+                "selected": None,
+            }
+        },
+    )
+
+    def select(node):
+        widget.state.selected = node
+        return sum(1 for n in widget.state.data.nodes[:100] if n["count"] > 0)
+
+    widget.define_action(select, recorded=True)
+    return widget
+
+
+def synthetic_stream(n_clients, rate, duration, call_ratio, n_nodes, seed=0):
+    """
+    Events of n_clients each sending rate events per second (as a Poisson
+    process), call_ratio of them call_func and the rest update_model
+    """
+    rng = random.Random(seed)
+    events = []
+    for client in range(n_clients):
+        t = rng.expovariate(rate)
+        while t < duration:
+            if rng.random() < call_ratio:
+                event = {
+                    "type": "call_func",
+                    "payload": {
+                        "path": ["actions", "select"],
+                        "args": [rng.randrange(n_nodes)],
+                    },
+                }
+            else:
+                event = {
+                    "type": "update_model",
+                    "payload": {
+                        "path": ["state", "filters", "min_count"],
+                        "value": rng.randrange(100),
+                    },
+                }
+            events.append({"t": t, "client": client, **event})
+            t += rng.expovariate(rate)
+    events.sort(key=lambda event: event["t"])
+    return events
+
+
+def percentiles(values: List[float]):
+    if not values:
+        return float("nan"), float("nan")
+    values = sorted(values)
+    return (
+        values[len(values) // 2],
+        values[min(int(len(values) * 0.99), len(values) - 1)],
+    )
+
+
+class Run:
+    """
+    One run of a stream against a widget with n_clients mounted clients
+    """
+
+    def __init__(self, widget, n_clients, events, broadcast_rate):
+        self.widget = widget
+        self.n_clients = n_clients
+        self.events = events
+        self.broadcast_rate = broadcast_rate
+        self.clients: List[HeadlessClient] = []
+        self.latencies: Dict[str, List[float]] = {"update_model": [], "call_func": []}
+        self.queue_depths: List[int] = []
+        # Sent but not completed events: call_func by return id, and
+        # update_model as [model version, sent time, clients left to render]
+        self.__calls: Dict[str, float] = {}
+        self.__updates: List[list] = []
+        self.__next_return_id = 0
+
+    def record_metric(self, name, value, labels):
+        if name == "messages.pending" and labels.get("widget") == "LoadTest":
+            self.queue_depths.append(value)
+
+    async def render_loop(self, client: HeadlessClient):
+        while True:
+            props = await client.render()
+            now = time.perf_counter()
+            for message in props["messages"]:
+                sent = self.__calls.pop(message["type"], None)
+                if sent is not None:
+                    self.latencies["call_func"].append(now - sent)
+
+            for update in self.__updates:
+                version, sent, waiting = update
+                if client in waiting and client.model_version >= version:
+                    waiting.remove(client)
+                    if not waiting:
+                        self.latencies["update_model"].append(now - sent)
+            self.__updates = [update for update in self.__updates if update[2]]
+
+            await client.ack()
+
+    async def send(self, event):
+        client = self.clients[event["client"] % self.n_clients]
+        payload = event["payload"]
+        sent = time.perf_counter()
+        if event["type"] == "call_func":
+            return_id = f"load_{self.__next_return_id}"
+            self.__next_return_id += 1
+            self.__calls[return_id] = sent
+            payload = {**payload, "returnId": return_id}
+
+        await client.send(event["type"], payload)
+
+        if event["type"] == "update_model":
+            others = {other for other in self.clients if other is not client}
+            if others:
+                version = WidgetModel.patches(self.widget.model).version
+                self.__updates.append([version, sent, others])
+
+    async def broadcast_loop(self):
+        i = 0
+        while True:
+            await asyncio.sleep(1 / self.broadcast_rate)
+            self.widget.send_message("broadcast", i)
+            i += 1
+
+    async def __call__(self, duration):
+        for _ in range(self.n_clients):
+            client = HeadlessClient(self.widget)
+            await client.__aenter__()
+            self.clients.append(client)
+
+        tasks = [asyncio.create_task(self.render_loop(c)) for c in self.clients]
+        if self.broadcast_rate:
+            tasks.append(asyncio.create_task(self.broadcast_loop()))
+
+        # Each client sends its events in order, concurrently with the others
+        streams: Dict[int, List[dict]] = {}
+        for event in self.events:
+            streams.setdefault(event["client"] % self.n_clients, []).append(event)
+
+        async def replay(events):
+            for event in events:
+                delay = start + event["t"] - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await self.send(event)
+
+        renders_before = sum(client.renders for client in self.clients)
+        start = time.perf_counter()
+        await asyncio.gather(*(replay(events) for events in streams.values()))
+        remaining = start + duration - time.perf_counter()
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+        elapsed = time.perf_counter() - start
+        renders = sum(client.renders for client in self.clients) - renders_before
+
+        # Let the last events complete
+        try:
+            await asyncio.wait_for(self.widget.drain(), 1)
+        except asyncio.TimeoutError:
+            pass
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for client in self.clients:
+            await client.__aexit__(None, None, None)
+
+        return {
+            "events_per_second": len(self.events) / elapsed,
+            "renders_per_second": renders / elapsed,
+            "lost": len(self.__calls) + len(self.__updates),
+        }
+
+
+def run(n_clients, events, args):
+    widget = make_widget(args.nodes)
+    widget.set_max_frame_rate(args.max_frame_rate or None)
+    load = Run(widget, n_clients, events, args.broadcast)
+    with metrics.add_sink(metrics.CallbackSink(load.record_metric)):
+        result = asyncio.run(load(args.duration))
+
+    update_p50, update_p99 = percentiles(load.latencies["update_model"])
+    call_p50, call_p99 = percentiles(load.latencies["call_func"])
+    depths = load.queue_depths or [0]
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    rss_mb = rss / 2**20 if sys.platform == "darwin" else rss / 2**10
+    print(
+        f"{n_clients:>8}{result['events_per_second']:>10.0f}"
+        f"{update_p50 * 1e3:>10.1f}{update_p99 * 1e3:>10.1f}"
+        f"{call_p50 * 1e3:>10.1f}{call_p99 * 1e3:>10.1f}"
+        f"{result['renders_per_second']:>11.0f}{max(depths):>8}"
+        f"{sum(depths) / len(depths):>8.1f}{result['lost']:>7}{rss_mb:>10.0f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", default="1,10,50,100")
+    parser.add_argument(
+        "--rate", type=float, default=20, help="events per second per client"
+    )
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument(
+        "--broadcast", type=float, default=10, help="broadcast messages per second"
+    )
+    parser.add_argument("--call-ratio", type=float, default=0.3)
+    parser.add_argument("--nodes", type=int, default=10000)
+    parser.add_argument("--max-frame-rate", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--replay", metavar="FILE")
+    group.add_argument("--record", metavar="FILE")
+    args = parser.parse_args()
+
+    counts = [int(n) for n in args.clients.split(",")]
+
+    def stream(n_clients):
+        return synthetic_stream(
+            n_clients, args.rate, args.duration, args.call_ratio, args.nodes, args.seed
+        )
+
+    if args.record:
+        with open(args.record, "w") as f:
+            for event in stream(max(counts)):
+                f.write(json.dumps(event) + "\n")
+        return
+
+    replayed = None
+    if args.replay:
+        with open(args.replay) as f:
+            replayed = [json.loads(line) for line in f if line.strip()]
+        args.duration = max((event["t"] for event in replayed), default=0)
+
+    print(
+        f"{'clients':>8}{'events/s':>10}{'update latency (ms)':>20}"
+        f"{'call latency (ms)':>20}{'renders/s':>11}{'queue depth':>16}"
+        f"{'lost':>7}{'RSS (MB)':>10}"
+    )
+    print(
+        f"{'':>18}{'p50':>10}{'p99':>10}{'p50':>10}{'p99':>10}"
+        f"{'':>11}{'max':>8}{'mean':>8}"
+    )
+    for n_clients in counts:
+        run(n_clients, replayed if replayed is not None else stream(n_clients), args)
+
+
+if __name__ == "__main__":
+    main()
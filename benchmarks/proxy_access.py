@@ -0,0 +1,71 @@
+"""
+Per-access overhead of reading nested values through model proxies, compared
+with raw dict access.
+
+Usage: python benchmarks/proxy_access.py [--nodes 10000] [--repeat 5]
+"""
+
+import argparse
+import time
+
+from magneton.core.widget import WidgetModel
+
+
+def measure(fn, n, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times) / n * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    n = args.nodes
+    raw = {"data": {"nodes": [{"count": i} for i in range(n)]}}
+    model = WidgetModel.dotdict(raw)
+    proxy = WidgetModel.dict(raw)
+
+    def read_raw():
+        for i in range(n):
+            raw["data"]["nodes"][i]["count"]
+
+    def read_items():
+        for i in range(n):
+            proxy["data"]["nodes"][i]["count"]
+
+    def read_attributes():
+        for i in range(n):
+            model.data.nodes[i]["count"]
+
+    def iterate():
+        for node in model.data.nodes:
+            node["count"]
+
+    def check_type():
+        for _ in range(n):
+            WidgetModel.has_instance(model)
+
+    cases = {
+        "raw dict": read_raw,
+        "proxy[...]": read_items,
+        "proxy.attribute": read_attributes,
+        "iterate proxy": iterate,
+        "has_instance": check_type,
+    }
+
+    baseline = None
+    print(f"{'access':<20}{'ns/access':>12}{'x raw':>8}")
+    for name, fn in cases.items():
+        ns = measure(fn, n, args.repeat)
+        baseline = baseline or ns
+        print(f"{name:<20}{ns:>12.0f}{ns / baseline:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+"""
+Benchmark suite for the hot paths of the widget core: model proxies,
+WidgetModel.export, utils.deepcopy, push_state/pop_state on a long history
+and the message round trip of a headless component (see headless.py).
+
+Every case runs on synthetic data (wide dicts, deep nesting, 1e5-1e6 element
+lists, long histories), offline and without a browser. The message round
+trip needs the built JS bundle, and is reported as skipped without it. For each case the
+suite reports the throughput (items per second), latency percentiles of one
+run, and the peak memory allocated by a run. Results can be saved as a named
+baseline and compared against later; comparisons exit with status 1 if any
+case got slower (p50) or hungrier (peak memory) than the tolerance allows.
+
+Usage: python benchmarks/suite.py [--only export,deepcopy] [--scale 1]
+                                  [--repeat 20] [--save NAME | --compare NAME]
+                                  [--tolerance 0.2]
+
+Baselines are kept in benchmarks/baselines/NAME.json and are only meaningful
+on the machine that saved them, so they are not committed: save one from the
+main branch with --save main, then --compare main on your branch. Cases of
+the baseline without a result (failed or skipped) count as regressions.
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from magneton.core.widget import WidgetModel
+from magneton.core.widget.StatefulWidgetBase import StatefulWidgetBase
+from magneton.core.widget.widget_base import WidgetBase
+from magneton.utils.deepcopy import deepcopy
+
+from headless import HeadlessClient, missing_bundle
+
+BASELINES_PATH = Path(__file__).parent / "baselines"
+
+
+class Case(NamedTuple):
+    run: Callable[[], None]
+    # Number of items processed by one run, for the throughput
+    items: int = 1
+    cleanup: Optional[Callable[[], None]] = None
+
+
+CASES: Dict[str, Callable[[float], Case]] = {}
+
+
+class Skip(Exception):
+    """
+    Raised by the setup of a case that cannot run here, with the reason
+    """
+
+
+def case(name):
+    def register(setup):
+        CASES[name] = setup
+        return setup
+
+    return register
+
+
+def make_shape(shape, scale):
+    """
+    Returns a synthetic value of the given shape, and its number of items
+    """
+    n = int(100000 * scale)
+    if shape == "wide_dict":
+        return {f"key_{i}": i for i in range(n)}, n
+    if shape == "ints":
+        return list(range(10 * n)), 10 * n
+    if shape == "records":
+        return [
+            {"id": i, "label": f"node {i}", "tags": ["a", "b"]} for i in range(n)
+        ], n
+
+    # Deep enough to stress recursion, but within json's recursion limit
+    depth = max(int(500 * scale), 10)
+    deep = leaf = {}
+    for _ in range(depth):
+        leaf["child"] = {"value": 0}
+        leaf = leaf["child"]
+    return deep, depth
+
+
+def read_wide_dict(model):
+    for key in model:
+        model[key]
+
+
+def read_deep(model):
+    node = model
+    while "child" in node:
+        node = node["child"]
+
+
+def read_ints(model):
+    for value in model:
+        pass
+
+
+def read_records(model):
+    for record in model:
+        record["label"]
+
+
+_READERS = {
+    "wide_dict": read_wide_dict,
+    "deep": read_deep,
+    "ints": read_ints,
+    "records": read_records,
+}
+
+
+def _register_shape_cases():
+    for shape in _READERS:
+
+        @case(f"proxy.{shape}")
+        def proxy_case(scale, shape=shape):
+            value, items = make_shape(shape, scale)
+            read = _READERS[shape]
+            # Read through a fresh root proxy on every run, so that no child
+            # proxy is cached from earlier runs (see Observable.cached_proxy)
+            return Case(
+                lambda: read(WidgetModel.proxy({"value": value})["value"]), items
+            )
+
+        @case(f"export.{shape}")
+        def export_case(scale, shape=shape):
+            value, items = make_shape(shape, scale)
+            model = WidgetModel.proxy({"value": value})
+            return Case(lambda: WidgetModel.export(model), items)
+
+        @case(f"deepcopy.{shape}")
+        def deepcopy_case(scale, shape=shape):
+            value, items = make_shape(shape, scale)
+            return Case(lambda: deepcopy(value), items)
+
+
+_register_shape_cases()
+
+
+@lru_cache(maxsize=None)
+def make_history(scale):
+    """
+    A widget with a large state and a long history of interactions that each
+    change a small part of it, e.g. selecting nodes
+    """
+    n_nodes = int(100000 * scale)
+    n_entries = max(int(10000 * scale), 10)
+    rng = random.Random(0)
+
+    widget = StatefulWidgetBase("Benchmark")
+    widget.state = {
+        "data": {"nodes": [{"id": i, "count": 0} for i in range(n_nodes)]},
+        "filters": {"min_count": 0, "labels": []},
+        "selected": None,
+    }
+
+    def mutate():
+        widget.state.selected = rng.randrange(n_nodes)
+        widget.state.filters.min_count = rng.randrange(10)
+
+    for _ in range(n_entries):
+        mutate()
+        widget.push_state(action={"name": "mutate", "args": (), "kwargs": {}})
+    return widget, mutate, rng
+
+
+@case("history.push_state")
+def push_state_case(scale):
+    widget, mutate, _ = make_history(scale)
+
+    def run():
+        mutate()
+        widget.push_state(action={"name": "mutate", "args": (), "kwargs": {}})
+
+    return Case(run)
+
+
+@case("history.pop_state")
+def pop_state_case(scale):
+    widget, _, rng = make_history(scale)
+    n_entries = len(widget.history)
+    return Case(lambda: widget.pop_state(rng.randrange(n_entries)))
+
+
+@case("messages.round_trip")
+def round_trip_case(scale):
+    """
+    send_message(), the render that delivers it to the component, and the
+    component's acknowledgement
+    """
+    bundle = missing_bundle()
+    if bundle is not None:
+        raise Skip(f"no JS bundle at {bundle}")
+
+    loop = asyncio.new_event_loop()
+    widget = WidgetBase("Benchmark", model={"value": 0})
+    # Measure the round trip itself rather than the wait for the next frame
+    widget.set_max_frame_rate(None)
+    client = HeadlessClient(widget)
+    loop.run_until_complete(client.__aenter__())
+
+    async def round_trip():
+        widget.send_message("benchmark", {"value": 1})
+        await client.render()
+        await client.ack()
+
+    def cleanup():
+        loop.run_until_complete(client.__aexit__(None, None, None))
+        loop.close()
+
+    return Case(lambda: loop.run_until_complete(round_trip()), cleanup=cleanup)
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    i = min(int(round(p / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[i]
+
+
+def measure(bench: Case, repeat: int, warmup: int) -> Dict[str, float]:
+    for _ in range(warmup):
+        bench.run()
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        bench.run()
+        times.append(time.perf_counter() - start)
+    times.sort()
+
+    # Measure memory in a separate run, since tracing slows everything down
+    tracemalloc.start()
+    start_memory = tracemalloc.get_traced_memory()[0]
+    bench.run()
+    peak = tracemalloc.get_traced_memory()[1] - start_memory
+    tracemalloc.stop()
+
+    p50 = percentile(times, 50)
+    return {
+        "items_per_second": bench.items / p50 if p50 > 0 else float("inf"),
+        "p50_ms": p50 * 1e3,
+        "p95_ms": percentile(times, 95) * 1e3,
+        "p99_ms": percentile(times, 99) * 1e3,
+        "peak_mb": peak / 2**20,
+    }
+
+
+def compare(names, results, baseline, tolerance) -> List[str]:
+    """
+    Returns a description of every regression of results over baseline,
+    including cases of names that have a baseline but no result
+    """
+    regressions = []
+    for name in names:
+        base = baseline.get(name)
+        if base is None:
+            continue
+        result = results.get(name)
+        if result is None:
+            regressions.append(f"{name}: no result")
+            continue
+        for key in ("p50_ms", "peak_mb"):
+            # Ignore differences too small to measure reliably
+            floor = 0.01 if key == "p50_ms" else 0.1
+            if result[key] > max(base[key], floor) * (1 + tolerance):
+                regressions.append(
+                    f"{name}: {key} {base[key]:.3f} -> {result[key]:.3f}"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--only", help="comma separated case names or prefixes, e.g. export,proxy"
+    )
+    parser.add_argument("--scale", type=float, default=1)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--save", metavar="NAME")
+    group.add_argument("--compare", metavar="NAME")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    names = list(CASES)
+    if args.only:
+        prefixes = args.only.split(",")
+        names = [n for n in names if any(n.startswith(p) for p in prefixes)]
+
+    baseline = None
+    if args.compare:
+        baseline = json.loads((BASELINES_PATH / f"{args.compare}.json").read_text())
+        if baseline["scale"] != args.scale:
+            parser.error(f"baseline was saved with --scale {baseline['scale']}")
+
+    print(
+        f"{'case':<24}{'items/s':>14}{'p50 (ms)':>12}{'p95 (ms)':>12}"
+        f"{'p99 (ms)':>12}{'peak (MB)':>12}{'vs base':>10}"
+    )
+    results = {}
+    for name in names:
+        try:
+            bench = CASES[name](args.scale)
+        except Skip as e:
+            print(f"{name:<24}{'skipped':>14}  ({e})")
+            continue
+        try:
+            result = results[name] = measure(bench, args.repeat, args.warmup)
+        except RecursionError:
+            # Expected for the deepest shapes
+            print(f"{name:<24}{'RecursionError':>14}")
+            continue
+        finally:
+            if bench.cleanup is not None:
+                bench.cleanup()
+
+        ratio = ""
+        if baseline is not None and name in baseline["results"]:
+            ratio = f"{result['p50_ms'] / baseline['results'][name]['p50_ms']:.2f}x"
+        print(
+            f"{name:<24}{result['items_per_second']:>14.4g}"
+            f"{result['p50_ms']:>12.3f}{result['p95_ms']:>12.3f}"
+            f"{result['p99_ms']:>12.3f}{result['peak_mb']:>12.2f}{ratio:>10}"
+        )
+
+    if args.save:
+        BASELINES_PATH.mkdir(exist_ok=True)
+        path = BASELINES_PATH / f"{args.save}.json"
+        path.write_text(
+            json.dumps(
+                {
+                    "python": sys.version.split()[0],
+                    "platform": platform.platform(),
+                    "scale": args.scale,
+                    "results": results,
+                },
+                indent=2,
+            )
+        )
+        print(f"\nsaved baseline to {path}")
+
+    if baseline is not None:
+        regressions = compare(names, results, baseline["results"], args.tolerance)
+        if regressions:
+            print("\nregressions:\n" + "\n".join(regressions))
+            sys.exit(1)
+        print("\nno regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Creates and drops batches of history views on one widget, and reports after
+each batch how many views are still alive, the traced memory, and the time
+of a push_state() (which syncs every live view). All three should stay flat.
+
+Usage: python benchmarks/view_lifecycle.py [--views 1000] [--rounds 5]
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+from weakref import WeakSet
+
+from magneton.core.widget import HistoryView, StateView
+from magneton.core.widget.StatefulWidgetBase import StatefulWidgetBase
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--views", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    target = StatefulWidgetBase("Target", model={"state": {"count": 0}})
+    target.push_state()
+    alive = WeakSet()
+
+    tracemalloc.start()
+    print(f"{'round':>5}{'views alive':>14}{'memory (KB)':>14}{'push (ms)':>12}")
+    for round in range(args.rounds):
+        for i in range(args.views):
+            view = HistoryView(target) if i % 2 else StateView(target)
+            alive.add(view)
+        del view
+        gc.collect()
+
+        target.state.count += 1
+        start = time.perf_counter()
+        target.push_state()
+        elapsed = time.perf_counter() - start
+
+        memory = tracemalloc.get_traced_memory()[0]
+        print(f"{round:>5}{len(alive):>14}{memory / 1024:>14.0f}{elapsed * 1e3:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,12 @@
-# Check the version of runtime dependencies
-import pkg_resources
-from packaging import version
+"""
+Importing the package is kept cheap: widgets (and with them idom and
+idom_jupyter) are only imported when first accessed, and the runtime
+dependency checks only run once widgets are loaded (see idom_loader).
+"""
 
-assert version.parse(
-    pkg_resources.get_distribution("notebook").version
-) < version.parse("7")
-assert version.parse(
-    pkg_resources.get_distribution("ipywidgets").version
-) < version.parse("8")
+from importlib import import_module
 
 # Set up package
-from pathlib import Path
-
 EPOCH = ""
 MODE = "production"
 try:
@@ -22,12 +17,49 @@ try:
     # TODO: find a better way to switch between prod/dev mode. Maybe environment
     # variable? But where?
     MODE = "development"
-except ImportError or ModuleNotFoundError:
+except ImportError:
     pass
 
-_VERSION_PATH = Path(__file__).parent / "version"
-VERSION = Path(_VERSION_PATH).read_text().strip()
-print("magneton_client: " + VERSION)
+# Exported widgets, by the module that defines them
+_LAZY_EXPORTS = {
+    "PlaceHolder": ".widgets.PlaceHolder",
+}
+
+__all__ = ["EPOCH", "MODE", "VERSION", *_LAZY_EXPORTS]
+
+_runtime_checked = False
+
+
+def check_runtime():
+    """
+    Check the version of the runtime dependencies of widgets. Widgets need
+    notebook<7 and ipywidgets<8.
+    """
+    global _runtime_checked
+    if _runtime_checked:
+        return
+
+    from importlib.metadata import version
+
+    for name, below in (("notebook", 7), ("ipywidgets", 8)):
+        major = version(name).split(".", 1)[0]
+        assert int(major) < below, f"magneton requires {name}<{below}"
+    _runtime_checked = True
+
+
+def __getattr__(name):
+    if name == "VERSION":
+        from pathlib import Path
+
+        value = (Path(__file__).parent / "version").read_text().strip()
+    elif name in _LAZY_EXPORTS:
+        value = getattr(import_module(_LAZY_EXPORTS[name], __name__), name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    globals()[name] = value
+    return value
+
 
-# Export widgets
-from .widgets.PlaceHolder import PlaceHolder
\ No newline at end of file
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
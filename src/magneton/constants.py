@@ -14,3 +14,22 @@ SERVICE_ENDPOINTS = {
     'get_node_parents':'/node_parent'
 }
 REQUEST_TIMEOUT_SECONDS = 150
+
+# Seconds that responses of read-only endpoints stay cached, when a client is
+# given a cache (see response_cache.py and helpers.get_client). Endpoints
+# missing here are never cached.
+CACHE_TTL_SECONDS = {
+    'get_node_distribution': 3600,
+    'get_relation_distribution': 3600,
+    'get_node_granularity_distribution': 3600,
+    'get_children_node_distributions': 3600,
+    'get_edge_list': 3600,
+    'get_node_degree_distribution': 3600,
+    'get_node_neighborhood': 600,
+    'get_relation_neighborhood': 600,
+    'get_node_parents': 600,
+    'get_annotated_corpus': 600,
+    'get_merge_data': 600,
+}
+# Endpoints that change the corpus, and thus invalidate every cached response
+CACHE_INVALIDATING_ENDPOINTS = ('load_corpus_from_data', 'load_merge_data')
@@ -0,0 +1,168 @@
+"""
+Jupyter server extension that serves magneton bundles from the idom web
+modules directory with long-term caching, and their precompressed variants
+(see idom_loader.register_bundle) to browsers that accept them. Enable it
+with:
+
+    jupyter serverextension enable --py magneton.core.bundle_server
+
+Without it, bundles are served by idom_jupyter as plain files that browsers
+revalidate on every load.
+
+Tornado routes a request with the first host rule whose handlers match it,
+and notebook loads server extensions by name, so idom_jupyter's handler of
+every web module is registered first. Loading this extension moves its rule
+ahead of it in the application's router, which relies on the router
+structure of tornado and on how notebook and idom_jupyter register their
+handlers. The extension therefore only loads with the versions it was
+checked against (see SUPPORTED_VERSIONS). With other versions, or if the
+router is not as expected, it logs a warning and bundles are served by
+idom_jupyter.
+"""
+
+from importlib.metadata import PackageNotFoundError, version
+import logging
+import os
+import re
+from typing import List
+from urllib.parse import urljoin
+
+from notebook.base.handlers import AuthenticatedFileHandler
+from tornado import version as tornado_version, web
+
+# Route of idom_jupyter's web modules (see idom_jupyter.jupyter_server_extension)
+RESOURCE_BASE_PATH = "_idom_web_modules"
+
+# Bundles are named by a hash of their content, so they never change
+BUNDLE_PATTERN = r"magneton_[0-9a-zA-Z]+\.js"
+
+# Encodings of the precompressed variants, by order of preference
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+CACHE_SECONDS = 365 * 24 * 3600
+
+# Versions the extension was checked against, as (distribution, lowest,
+# below) major and minor versions
+SUPPORTED_VERSIONS = (
+    ("tornado", (6, 0), (7, 0)),
+    ("notebook", (6, 0), (7, 0)),
+    ("idom", (0, 38), (0, 39)),
+    ("idom-jupyter", (0, 7), (0, 8)),
+)
+
+logger = logging.getLogger(__name__)
+
+
+class BundleHandler(AuthenticatedFileHandler):
+    def initialize(self, path, default_filename=None):
+        super().initialize(path, default_filename)
+        self.__encoding = None
+
+    def parse_url_path(self, url_path):
+        accepted = self.request.headers.get("Accept-Encoding", "")
+        accepted = {encoding.split(";")[0].strip() for encoding in accepted.split(",")}
+        for encoding, suffix in ENCODINGS:
+            variant = url_path + suffix
+            if encoding in accepted and os.path.isfile(
+                self.get_absolute_path(self.root, variant)
+            ):
+                self.__encoding = encoding
+                return variant
+        return url_path
+
+    def get_content_type(self):
+        return "application/javascript; charset=UTF-8"
+
+    def set_extra_headers(self, path):
+        self.set_header("Vary", "Accept-Encoding")
+        if self.__encoding is not None:
+            self.set_header("Content-Encoding", self.__encoding)
+
+    def get_cache_time(self, path, modified, mime_type):
+        return CACHE_SECONDS
+
+    def set_headers(self):
+        # Skip AuthenticatedFileHandler's "no-cache", since bundles with the
+        # same name never change
+        web.StaticFileHandler.set_headers(self)
+        self.set_header("Cache-Control", f"private, max-age={CACHE_SECONDS}, immutable")
+
+
+def _jupyter_server_extension_paths():
+    return [{"module": "magneton.core.bundle_server"}]
+
+
+def _load_jupyter_server_extension(notebook_app):
+    from idom.config import IDOM_WEB_MODULES_DIR
+    import idom_jupyter.jupyter_server_extension  # noqa: F401 (sets the directory)
+
+    unsupported = _unsupported_versions()
+    if unsupported:
+        logger.warning(
+            "magneton bundles are served without caching: the bundle server "
+            "does not support %s",
+            ", ".join(unsupported),
+        )
+        return
+
+    web_app = notebook_app.web_app
+    base_url = web_app.settings["base_url"]
+    route_pattern = urljoin(base_url, rf"{RESOURCE_BASE_PATH}/({BUNDLE_PATTERN})")
+    web_app.add_handlers(
+        host_pattern=r".*$",
+        host_handlers=[
+            (
+                route_pattern,
+                BundleHandler,
+                {"path": str(IDOM_WEB_MODULES_DIR.current.absolute())},
+            )
+        ],
+    )
+    _move_rule_first(web_app)
+
+
+def _unsupported_versions() -> List[str]:
+    """
+    Returns the installed distributions of SUPPORTED_VERSIONS whose version
+    is not supported, with their version
+    """
+    unsupported = []
+    for name, lowest, below in SUPPORTED_VERSIONS:
+        try:
+            installed = version(name)
+        except PackageNotFoundError:
+            installed = "none"
+        match = re.match(r"(\d+)\.(\d+)", installed)
+        if match is None or not lowest <= tuple(map(int, match.groups())) < below:
+            unsupported.append(f"{name} {installed}")
+    return unsupported
+
+
+def _move_rule_first(web_app):
+    """
+    Move the host rule of BundleHandler ahead of the other host rules of the
+    application (see the module docstring)
+    """
+    rules = getattr(getattr(web_app, "default_router", None), "rules", None)
+    ours = None
+    if isinstance(rules, list):
+        for rule in rules:
+            handlers = getattr(rule.target, "rules", [])
+            if any(getattr(r, "target", None) is BundleHandler for r in handlers):
+                ours = rule
+                break
+
+    if ours is None:
+        logger.warning(
+            "magneton bundles are served without caching: unexpected router "
+            "structure (tornado %s)",
+            tornado_version,
+        )
+        return
+
+    rules.remove(ours)
+    rules.insert(0, ours)
+
+
+# compat for older versions of Jupyter
+load_jupyter_server_extension = _load_jupyter_server_extension
@@ -1,8 +1,17 @@
+import gzip
+import hashlib
+import json
 import os
+import re
+import shutil
+from pathlib import Path
 import idom
-from shortuuid import uuid
+from idom.config import IDOM_WEB_MODULES_DIR
+from idom.web.module import WebModule
 import idom_jupyter
-from .. import MODE
+from .. import MODE, check_runtime
+
+check_runtime()
 
 
 def rel_to_abs(path):
@@ -20,14 +29,21 @@ __web_module = None
 
 NAME = "magneton"
 
+# Number of bundle versions kept in the web modules directory, for other
+# kernels and notebooks still open in browsers
+KEEP_BUNDLES = 3
+
+# Precompressed variants written next to each bundle (see bundle_server)
+COMPRESSED_SUFFIXES = {"gzip": ".gz", "br": ".br"}
+
+_BUNDLE_NAME = re.compile(rf"^{NAME}_[0-9a-zA-Z]+\.js$")
+
 
 def __load_web_module():
     global __web_module
 
     if __web_module == None:
-        __web_module = idom.web.module_from_file(
-            name=f"{NAME}", file=BUNDLE_PATH, fallback=FALLBACK
-        )
+        __web_module = register_bundle(BUNDLE_PATH)
 
     return __web_module
 
@@ -38,12 +54,109 @@ def load_component(component_name):
 
 
 def reload_bundle():
+    """
+    Register the bundle again if its content changed since it was loaded
+    """
     global __web_module
 
-    # Append a random string to the module name
-    # to force it to reload
-    uid = uuid()[:6]
-
-    __web_module = idom.web.module_from_file(
-        name=f"{NAME}_{uid}", file=BUNDLE_PATH, fallback=FALLBACK
+    __web_module = register_bundle(BUNDLE_PATH)
+
+
+def register_bundle(path) -> WebModule:
+    """
+    Register the bundle at path as a web module named by a hash of its
+    content, so that registering an unchanged bundle does nothing and
+    browsers can cache it for good. The first registration of a bundle also
+    writes its precompressed variants and removes old bundles.
+    """
+    modules_dir = Path(IDOM_WEB_MODULES_DIR.current)
+    name = f"{NAME}_{bundle_digest(path, modules_dir)}.js"
+    target = modules_dir / name
+
+    if not target.exists():
+        modules_dir.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first, since other kernels may be
+        # registering the same bundle
+        temp = target.with_name(f"{name}.{os.getpid()}.tmp")
+        shutil.copyfile(path, temp)
+        _write_compressed(temp, target)
+        os.replace(temp, target)
+        _remove_old_bundles(modules_dir, keep=name)
+    else:
+        # Mark the bundle as recently used, so it is not removed as old
+        os.utime(target)
+
+    # The bundle is already in the web modules directory, under its name, so
+    # idom does not copy it again (idom adds the .js suffix to the name)
+    return idom.web.module_from_file(
+        target.stem, target, fallback=FALLBACK, resolve_exports=False
     )
+
+
+def bundle_digest(path, modules_dir: Path) -> str:
+    """
+    Returns a hash of the content of the bundle at path. Hashes are cached
+    in the web modules directory by path, size and modification time, so
+    that the bundle is only read once it changed.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    key = [stat.st_size, stat.st_mtime_ns]
+
+    cache_path = modules_dir / f"{NAME}.digests.json"
+    try:
+        cache = json.loads(cache_path.read_text())
+    except (OSError, ValueError):
+        cache = {}
+    cached = cache.get(path)
+    if cached is not None and cached["key"] == key:
+        return cached["digest"]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    cache[path] = {"key": key, "digest": digest.hexdigest()[:16]}
+
+    try:
+        modules_dir.mkdir(parents=True, exist_ok=True)
+        cache_path.write_text(json.dumps(cache))
+    except OSError:
+        pass
+    return cache[path]["digest"]
+
+
+def _write_compressed(source: Path, target: Path):
+    content = source.read_bytes()
+    variants = {"gzip": lambda: gzip.compress(content, compresslevel=9, mtime=0)}
+    try:
+        import brotli
+
+        variants["br"] = lambda: brotli.compress(content)
+    except ImportError:
+        pass
+
+    for encoding, compress in variants.items():
+        compressed = target.with_name(target.name + COMPRESSED_SUFFIXES[encoding])
+        temp = compressed.with_name(f"{compressed.name}.{os.getpid()}.tmp")
+        temp.write_bytes(compress())
+        os.replace(temp, compressed)
+
+
+def _remove_old_bundles(modules_dir: Path, keep: str):
+    """
+    Remove all but the KEEP_BUNDLES most recently registered bundles (and
+    their variants), always keeping the given one
+    """
+    bundles = []
+    for entry in os.scandir(modules_dir):
+        if _BUNDLE_NAME.match(entry.name) and entry.name != keep:
+            bundles.append((entry.stat().st_mtime, entry.name))
+    bundles.sort(reverse=True)
+
+    for _, name in bundles[KEEP_BUNDLES - 1 :]:
+        for suffix in ("", *COMPRESSED_SUFFIXES.values()):
+            try:
+                os.remove(modules_dir / (name + suffix))
+            except FileNotFoundError:
+                pass
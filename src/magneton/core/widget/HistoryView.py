@@ -6,11 +6,12 @@ class HistoryView:
         # Initialize base widget
         base = StatefulWidgetBase("HistoryView")
 
-        # Listen/sync when history changes
-        # TODO: Remove listeners when appropriate
-        # to avoid possible memory leaks
-        target.on_pop_state(self.__sync)
-        target.on_push_state(self.__sync)
+        # Listen/sync when history changes. Listeners are weak, so that the
+        # target does not keep views alive once they are dropped.
+        self.__subscriptions = [
+            target.on_pop_state(self.__sync, weak=True),
+            target.on_push_state(self.__sync, weak=True),
+        ]
 
         # Register actions
         base.define_action(self.restore_state)
@@ -24,10 +25,13 @@ class HistoryView:
 
     def __sync(self):
         """
-        Synchronize model with target, i.e. copy history and current index
+        Synchronize model with target, i.e. copy the history entries without
+        their state, the number of entries and current index. States are
+        only read when one is restored.
         """
         base, target = self.__base, self.__target
-        base.state.history = target.history
+        base.state.history = target.history_metadata()
+        base.state.count = len(target.history)
         base.state.active_index = target.current_index
 
     def restore_state(self, i: int):
@@ -35,3 +39,10 @@ class HistoryView:
 
     def show(self):
         return self.__base.component()
+
+    def dispose(self):
+        """
+        Stop syncing with the target
+        """
+        for subscription in self.__subscriptions:
+            subscription.dispose()
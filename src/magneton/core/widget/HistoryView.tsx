@@ -24,36 +24,34 @@ export const HistoryView = () => {
           <Table>
             <TableHead>
               <TableRow>
-                <TableCell width="15%">Action Type</TableCell>
-                <TableCell width="30%">Element</TableCell>
-                <TableCell width="15%">Component</TableCell>
-                <TableCell width="30%">Data</TableCell>
+                <TableCell width="10%">#</TableCell>
+                <TableCell width="20%">Action Type</TableCell>
+                <TableCell width="35%">Arguments</TableCell>
+                <TableCell width="25%">Keyword Arguments</TableCell>
                 <TableCell width="10%" />
               </TableRow>
             </TableHead>
             <TableBody>
               {state.history?.map((entry, i) => (
-                <TableRow key={i}>
+                <TableRow key={entry.seq}>
+                  <TableCell>{entry.seq}</TableCell>
                   <TableCell>
                     <ObjectExplorer value={entry.action.name} />
                   </TableCell>
-                    <TableCell>
-                      {entry.action.args.length > 0 ? (
-                        <ObjectExplorer value={entry.state.event_element} />
-                      ) : (
-                        "N/A"
-                      )}
-                    </TableCell>
-                    <TableCell>
-                      {entry.action.args.length > 1 ? (
-                        <ObjectExplorer value={entry.state.event_component} />
-                      ) : (
-                        "N/A"
-                      )}
-                    </TableCell>
-                    <TableCell>
-                      <ObjectExplorer value={entry.state.data} />
-                    </TableCell>
+                  <TableCell>
+                    {entry.action.args.length > 0 ? (
+                      <ObjectExplorer value={entry.action.args} />
+                    ) : (
+                      "N/A"
+                    )}
+                  </TableCell>
+                  <TableCell>
+                    {Object.keys(entry.action.kwargs).length > 0 ? (
+                      <ObjectExplorer value={entry.action.kwargs} />
+                    ) : (
+                      "N/A"
+                    )}
+                  </TableCell>
                   <TableCell>
                     {state.active_index === i ? (
                       <Button disabled>Current</Button>
@@ -78,7 +76,9 @@ export const HistoryView = () => {
 type Model = {
   actions: { restore_state: (i: number) => Promise<void> };
   state: {
-    history: { action: Record<string, any>; state: Record<string, any> }[];
+    // Entries without their state, which is only read when restored
+    history: { action: Record<string, any>; seq: number }[];
+    count: number;
     active_index: number;
   };
 };
@@ -6,8 +6,12 @@ class StateView:
         # Initialize base widget
         base = StatefulWidgetBase("StateView")
 
-        target.on_pop_state(self.__sync)
-        target.on_push_state(self.__sync)
+        # Listen/sync when history changes. Listeners are weak, so that the
+        # target does not keep views alive once they are dropped.
+        self.__subscriptions = [
+            target.on_pop_state(self.__sync, weak=True),
+            target.on_push_state(self.__sync, weak=True),
+        ]
 
         # Register actions
         #base.define_action(self.restore_state)
@@ -28,3 +32,10 @@ class StateView:
 
     def show(self):
         return self.__base.component()
+
+    def dispose(self):
+        """
+        Stop syncing with the target
+        """
+        for subscription in self.__subscriptions:
+            subscription.dispose()
@@ -1,5 +1,6 @@
-from asyncio import get_running_loop, iscoroutinefunction
+from asyncio import get_running_loop, iscoroutinefunction, sleep
 from inspect import isgenerator
+from time import perf_counter
 from typing import (
     Callable,
     Coroutine,
@@ -8,16 +9,22 @@ from typing import (
     List,
     Literal,
     Mapping,
+    Optional,
+    Sequence,
+    TypedDict,
     TypeVar,
     Union,
 )
 
 
+from .action_policy import ActionPolicy, ActionRunner
+from .offload import ExecutorOption, offload
 from .widget_base import WidgetBase
 from .widget_model import WidgetModel
-from ...utils.emitter import Emitter
-from ...utils.deepcopy import deepcopy
-
+from ...utils import metrics
+from ...utils.emitter import Emitter, Subscription
+from ...utils.history_file import HistoryFile
+from ...utils.snapshot import PathSet, diff, nbytes, restore, snapshot, thaw
 
 State = TypeVar("State", bound=Mapping)
 Actions = TypeVar("Actions", bound=Mapping[str, Callable])
@@ -42,6 +49,20 @@ class StatefulWidgetBase(WidgetBase, Generic[State, Actions]):
         self.__current_index = 0
         self.__emitter: Emitter[Literal["pop_state", "push_state"]] = Emitter()
 
+        # Snapshot the live state was last synced with, and the paths of the
+        # state that changed since then. History entries share every
+        # unchanged subtree with the previous snapshot.
+        self.__snapshot = None
+        self.__dirty = PathSet()
+        WidgetModel.track(self.model, self.__track_change)
+
+        # Bytes used by each history entry that are not shared with the entry
+        # before it, and the push number of each entry (used for keyframes)
+        self.__history_nbytes: List[int] = []
+        self.__history_seqs: List[int] = []
+        self.__push_count = 0
+        self.__history_budget: Optional[HistoryBudget] = None
+
     def define_action(
         self,
         action: Callable[
@@ -50,21 +71,48 @@ class StatefulWidgetBase(WidgetBase, Generic[State, Actions]):
         ],
         name: str = None,
         recorded: bool = False,
+        policy: Union[str, ActionPolicy] = "parallel",
+        max_parallel: Optional[int] = None,
+        executor: Optional[ExecutorOption] = None,
+        reads: Optional[Sequence[str]] = None,
     ):
+        """
+        Register an action that the frontend can call, and return a function
+        that calls it from Python as a task. policy and max_parallel control
+        how overlapping calls are handled, e.g. policy="latest" or
+        policy=debounce(200) (see ActionPolicy). Runs that are cancelled or
+        superseded do not push history.
+
+        With an executor ("thread", "process" or an Executor), the action is
+        called off the event loop as action(state, *args, **kwargs), with a
+        copy of the state (or of the paths in reads), and returns the changes
+        to apply to the state (see offload).
+        """
         if name is None:
             name = action.__name__
-
-        async def wrapper(*args, **kwargs):
-            retval = action(*args, **kwargs)
-
-            if iscoroutinefunction(action):
-                retval = await retval
-
-            if isgenerator(retval):
-                # Wait for component to render every time the generator yields
-                for _ in retval:
-                    await self.flush()
-
+        if executor is not None:
+            action = offload(action, executor, lambda: self.state, reads)
+
+        async def run(*args, **kwargs):
+            # Changes made between two awaits are rendered together
+            with WidgetModel.coalesce():
+                retval = action(*args, **kwargs)
+
+                if iscoroutinefunction(action):
+                    retval = await retval
+
+                if isgenerator(retval):
+                    # Render every time the generator yields. Renders are
+                    # limited to the widget's frame rate, so only give other
+                    # tasks (and the next frame, if due) a chance to run.
+                    try:
+                        for _ in retval:
+                            self.schedule_render()
+                            await sleep(0)
+                    finally:
+                        retval.close()
+
+        def commit(args, kwargs):
             # Render any state changes
             self.flush()
 
@@ -72,11 +120,31 @@ class StatefulWidgetBase(WidgetBase, Generic[State, Actions]):
                 # Add state to history if this is a recorded action
                 self.push_state(action={"name": name, "args": args, "kwargs": kwargs})
 
-        self.actions[name] = wrapper
+        async def wrapper(*args, **kwargs):
+            if not metrics.ENABLED:
+                await run(*args, **kwargs)
+                commit(args, kwargs)
+                return
+
+            labels = {"widget": self.component_name, "action": name}
+            start = perf_counter()
+            with metrics.collect_fetch_time() as fetch_time:
+                await run(*args, **kwargs)
+            elapsed = perf_counter() - start
+            # Requests still in flight in tasks started by the action may end
+            # after it, so cap the fetch time to the action's
+            fetch_seconds = min(fetch_time.seconds, elapsed)
+            metrics.record("action.fetch_seconds", fetch_seconds, **labels)
+            metrics.record("action.compute_seconds", elapsed - fetch_seconds, **labels)
+            with metrics.timer("action.flush_seconds", **labels):
+                commit(args, kwargs)
+
+        runner = ActionRunner(wrapper, policy, max_parallel)
+        self.actions[name] = runner
 
         def as_task(*args, **kwargs):
             loop = get_running_loop()
-            return loop.create_task(wrapper(*args, **kwargs))
+            return loop.create_task(runner(*args, **kwargs))
 
         return as_task
 
@@ -96,21 +164,221 @@ class StatefulWidgetBase(WidgetBase, Generic[State, Actions]):
     def current_index(self):
         return self.__current_index
 
+    @property
+    def history_nbytes(self) -> int:
+        """
+        Approximate memory used by the state snapshots in history, counting
+        structure shared between snapshots once
+        """
+        return sum(self.__history_nbytes)
+
+    def set_history_budget(
+        self,
+        max_entries: int = None,
+        max_bytes: int = None,
+        policy: Literal["drop_oldest", "thin"] = "drop_oldest",
+        keep_recent: int = 10,
+        keyframe_interval: int = 10,
+    ):
+        """
+        Limit the size of the history. Whenever a limit is exceeded, entries
+        are evicted according to the policy until it is met again:
+        - "drop_oldest": drop the oldest entries.
+        - "thin": first drop entries older than the `keep_recent` most recent
+          ones, except one keyframe every `keyframe_interval` pushes, then
+          drop the oldest.
+
+        The current entry and the most recent entry are never evicted. Pass
+        no limits to remove the budget.
+        """
+        if max_entries is None and max_bytes is None:
+            self.__history_budget = None
+            return
+
+        self.__history_budget = HistoryBudget(
+            max_entries=max_entries,
+            max_bytes=max_bytes,
+            policy=policy,
+            keep_recent=keep_recent,
+            keyframe_interval=keyframe_interval,
+        )
+        if self.__enforce_history_budget():
+            self.__emitter.emit("push_state")
+
+    def __over_history_budget(self):
+        budget = self.__history_budget
+        return (
+            budget["max_entries"] is not None
+            and len(self.history) > budget["max_entries"]
+        ) or (
+            budget["max_bytes"] is not None
+            and self.history_nbytes > budget["max_bytes"]
+        )
+
+    def __history_victim(self):
+        """
+        Index of the next history entry to evict, or None if none can be
+        """
+        budget = self.__history_budget
+        last = len(self.history) - 1
+        evictable = [i for i in range(last) if i != self.__current_index]
+
+        if budget["policy"] == "thin":
+            old = last + 1 - budget["keep_recent"]
+            for i in evictable:
+                if i >= old:
+                    break
+                if self.__history_seqs[i] % budget["keyframe_interval"] != 0:
+                    return i
+
+        return evictable[0] if evictable else None
+
+    def __enforce_history_budget(self):
+        """
+        Evict history entries until the budget is met. Returns whether any
+        entry was evicted.
+        """
+        if self.__history_budget is None:
+            return False
+
+        evicted = False
+        while self.__over_history_budget():
+            i = self.__history_victim()
+            if i is None:
+                break
+
+            # Objects shared with a neighbour survive the eviction, so only
+            # those unique to this entry are freed
+            history, sizes = self.history, self.__history_nbytes
+            neighbours = [
+                history[j]["state"] for j in (i - 1, i + 1) if 0 <= j < len(history)
+            ]
+            freed = nbytes(history[i]["state"], *neighbours)
+            if i + 1 < len(history):
+                sizes[i + 1] += sizes[i] - freed
+
+            del history[i]
+            del sizes[i]
+            del self.__history_seqs[i]
+            if i < self.__current_index:
+                self.__current_index -= 1
+            evicted = True
+
+        return evicted
+
+    def save_history(self, path, keyframe_interval: int = 128) -> HistoryFile:
+        """
+        Write the history to a new history file at path (see
+        utils.history_file), and keep it there: later entries are appended to
+        the file instead of being held in memory. Raises FileExistsError if
+        the file exists. Entries removed from a history file are not copied,
+        so this also compacts it.
+        """
+        file = HistoryFile(path, "x", keyframe_interval=keyframe_interval)
+        for entry, seq, size in zip(
+            self.history, self.__history_seqs, self.__history_nbytes
+        ):
+            file.append(entry, seq=seq, nbytes=size)
+
+        if isinstance(self.history, HistoryFile):
+            self.history.close()
+        self.history = file
+        return file
+
+    def load_history(self, path) -> HistoryFile:
+        """
+        Open the history file at path (see save_history) as the history, and
+        restore its last state. Later entries are appended to the file.
+        Raises FileNotFoundError if the file does not exist.
+        """
+        file = HistoryFile(path, "r")
+        if isinstance(self.history, HistoryFile):
+            self.history.close()
+
+        self.history = file
+        self.__history_seqs = file.seqs
+        self.__history_nbytes = file.sizes
+        self.__push_count = max(self.__history_seqs, default=-1) + 1
+        self.__snapshot = None
+        self.__dirty = PathSet()
+        self.__current_index = len(file) - 1
+
+        if len(file) > 0:
+            self.pop_state(len(file) - 1)
+        else:
+            self.__emitter.emit("pop_state")
+        return file
+
+    def history_metadata(self) -> List[Mapping]:
+        """
+        The history entries without their state, each with its push number
+        ("seq"). States of a history file are not decoded.
+        """
+        history = self.history
+        if isinstance(history, HistoryFile):
+            entries = (history.metadata(i) for i in range(len(history)))
+        else:
+            entries = (
+                {key: value for key, value in entry.items() if key != "state"}
+                for entry in history
+            )
+        return [
+            {**entry, "seq": seq} for entry, seq in zip(entries, self.__history_seqs)
+        ]
+
+    def watch(self, path, listener: Callable, weak: bool = False):
+        """
+        Call listener(tag, change) when the model subtree at path (e.g.
+        "state.data.nodes") changes. Returns an id for unwatch().
+        """
+        return WidgetModel.watch(self.model, path, listener, weak)
+
+    def unwatch(self, watcher_id: str):
+        WidgetModel.unwatch(self.model, watcher_id)
+
+    def __track_change(self, tag, change):
+        if change is None:
+            self.__dirty.add(())
+        elif len(change.path) == 0 or change.path[0] == "state":
+            self.__dirty.add(change.path[1:])
+
     def push_state(self, **kwargs):
         # Truncate history to active state index
-        self.history = self.history[: self.__current_index + 1]
+        del self.history[self.__current_index + 1 :]
+        del self.__history_nbytes[self.__current_index + 1 :]
+        del self.__history_seqs[self.__current_index + 1 :]
+
+        # Copy only what changed since the last snapshot
+        base = self.__snapshot
+        self.__snapshot = snapshot(self.state, base, self.__dirty)
+        self.__dirty.clear()
+
+        size = nbytes(self.__snapshot, *([base] if self.history else []))
+        seq = self.__push_count
+        self.__history_nbytes.append(size)
+        self.__history_seqs.append(seq)
+        self.__push_count += 1
 
         # Append
-        self.history.append(
-            {
-                **kwargs,
-                "state": deepcopy(self.state, replacer=WidgetModel.unproxy),
-            }
-        )
+        entry = {
+            **kwargs,
+            "state": self.__snapshot,
+        }
+        if isinstance(self.history, HistoryFile):
+            self.history.append(entry, seq=seq, nbytes=size)
+        else:
+            self.history.append(entry)
 
         # Update active state index
         self.__current_index = len(self.history) - 1
 
+        self.__enforce_history_budget()
+
+        if metrics.ENABLED:
+            labels = {"widget": self.component_name}
+            metrics.record("history.bytes", self.history_nbytes, **labels)
+            metrics.record("history.entries", len(self.history), **labels)
+
         # Notify listeners
         self.__emitter.emit("push_state")
 
@@ -119,8 +387,23 @@ class StatefulWidgetBase(WidgetBase, Generic[State, Actions]):
         if i is None:
             i = self.__current_index - 1
 
-        # Copy state from history
-        self.state = deepcopy(self.history[i]["state"], replacer=WidgetModel.unproxy)
+        # Only restore paths that differ from the target snapshot: those
+        # changed since the last snapshot, and those that differ between
+        # the last snapshot and the target
+        target = self.history[i]["state"]
+        paths, self.__dirty = self.__dirty, PathSet()
+        if self.__snapshot is None:
+            paths.add(())
+        else:
+            for path in diff(self.__snapshot, target):
+                paths.add(path)
+
+        with self.batch():
+            if not restore(self.state, target, paths):
+                self.state = thaw(target)
+
+        self.__snapshot = target
+        self.__dirty.clear()
         self.__current_index = i
 
         # Notify listeners
@@ -129,8 +412,9 @@ class StatefulWidgetBase(WidgetBase, Generic[State, Actions]):
     def on_push_state(
         self,
         listener: Callable[[], None],
-    ):
-        self.__emitter.on("push_state", listener)
+        weak: bool = False,
+    ) -> Subscription:
+        return self.__emitter.on("push_state", listener, weak)
 
     def off_push_state(
         self,
@@ -141,11 +425,20 @@ class StatefulWidgetBase(WidgetBase, Generic[State, Actions]):
     def on_pop_state(
         self,
         listener: Callable[[], None],
-    ):
-        self.__emitter.on("pop_state", listener)
+        weak: bool = False,
+    ) -> Subscription:
+        return self.__emitter.on("pop_state", listener, weak)
 
     def off_pop_state(
         self,
         listener: Callable[[], None],
     ):
-        self.__emitter.on("pop_state", listener)
+        self.__emitter.off("pop_state", listener)
+
+
+class HistoryBudget(TypedDict):
+    max_entries: Optional[int]
+    max_bytes: Optional[int]
+    policy: Literal["drop_oldest", "thin"]
+    keep_recent: int
+    keyframe_interval: int
@@ -1,4 +1,5 @@
 from .widget_base import WidgetBase
 from .widget_model import WidgetModel
+from .action_policy import ActionPolicy, debounce, throttle
 from .HistoryView import HistoryView
 from .StateView import StateView
\ No newline at end of file
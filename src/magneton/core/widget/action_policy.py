@@ -0,0 +1,143 @@
+from asyncio import CancelledError, Semaphore, ensure_future, get_running_loop, sleep
+from typing import (
+    Awaitable,
+    Callable,
+    Literal,
+    NamedTuple,
+    Optional,
+    Set,
+    Union,
+    get_args,
+)
+
+PolicyKind = Literal["parallel", "latest", "queue", "drop", "debounce", "throttle"]
+
+
+class ActionPolicy(NamedTuple):
+    """
+    How calls to an action that overlap are handled:
+    - "parallel": run every call right away (the default).
+    - "latest": cancel the runs still in progress when a new call comes in.
+    - "queue": run calls one after another, in order.
+    - "drop": ignore calls made while a run is in progress.
+    - "debounce": run only the last of a burst of calls, ms after it.
+    - "throttle": run at most one call every ms; the last call made in
+      between runs at the end of the interval.
+    """
+
+    kind: PolicyKind
+    ms: float = 0
+
+    def validate(self):
+        """
+        Raise a ValueError if the kind is unknown, or if a debounce or
+        throttle policy has no interval
+        """
+        if self.kind not in get_args(PolicyKind):
+            raise ValueError(
+                f"unknown action policy {self.kind!r}, expected one of "
+                f"{', '.join(map(repr, get_args(PolicyKind)))}"
+            )
+        if self.kind in ("debounce", "throttle") and not self.ms > 0:
+            raise ValueError(
+                f"{self.kind} policy needs a positive interval in ms, e.g. "
+                f"{self.kind}(300)"
+            )
+
+
+def debounce(ms: float) -> ActionPolicy:
+    return ActionPolicy("debounce", ms)
+
+
+def throttle(ms: float) -> ActionPolicy:
+    return ActionPolicy("throttle", ms)
+
+
+class ActionRunner:
+    """
+    Calls run(*args, **kwargs) according to a concurrency policy. max_parallel
+    limits the number of runs in progress at the same time ("queue" and
+    "drop" default to 1). Calls that are dropped, superseded or cancelled
+    return None.
+    """
+
+    def __init__(
+        self,
+        run: Callable[..., Awaitable],
+        policy: Union[str, ActionPolicy] = "parallel",
+        max_parallel: Optional[int] = None,
+    ):
+        if isinstance(policy, str):
+            policy = ActionPolicy(policy)
+        policy.validate()
+        if max_parallel is None and policy.kind in ("queue", "drop"):
+            max_parallel = 1
+
+        self.policy = policy
+        self.max_parallel = max_parallel
+        self.__run = run
+        self.__running: Set = set()
+        self.__superseded: Set = set()
+        self.__semaphore = None
+        self.__generation = 0
+        self.__last_start = None
+
+    async def __call__(self, *args, **kwargs):
+        kind = self.policy.kind
+
+        if kind == "drop" and len(self.__running) >= self.max_parallel:
+            return None
+
+        if kind == "latest":
+            for task in self.__running:
+                self.__superseded.add(task)
+                task.cancel()
+
+        if kind in ("debounce", "throttle"):
+            if not await self.__wait_turn(kind):
+                return None
+
+        if self.max_parallel is None or kind == "drop":
+            return await self.__start(args, kwargs)
+
+        if self.__semaphore is None:
+            self.__semaphore = Semaphore(self.max_parallel)
+        async with self.__semaphore:
+            return await self.__start(args, kwargs)
+
+    async def __wait_turn(self, kind: str) -> bool:
+        """
+        Wait until this call may run, returning False if a later call
+        superseded it in the meantime
+        """
+        self.__generation += 1
+        generation = self.__generation
+        now = get_running_loop().time()
+        delay = self.policy.ms / 1000
+
+        if kind == "throttle":
+            if self.__last_start is None or now - self.__last_start >= delay:
+                self.__last_start = now
+                return True
+            delay = self.__last_start + delay - now
+
+        await sleep(delay)
+        if generation != self.__generation:
+            return False
+
+        self.__last_start = get_running_loop().time()
+        return True
+
+    async def __start(self, args, kwargs):
+        task = ensure_future(self.__run(*args, **kwargs))
+        self.__running.add(task)
+        try:
+            return await task
+        except CancelledError:
+            if task in self.__superseded:
+                return None
+            task.cancel()
+            raise
+        finally:
+            self.__running.discard(task)
+            self.__superseded.discard(task)
@@ -0,0 +1,136 @@
+"""
+Compact encoding of NumPy arrays and pandas/Arrow tables in exported models.
+
+Instead of JSON number arrays, arrays are sent as their raw little-endian
+buffer (base64-encoded, since props are JSON) together with their dtype and
+shape, and tables are sent column by column. The frontend turns these back
+into typed arrays (see decodeBinary in widget-wrapper.tsx).
+
+NumPy, pandas and pyarrow are optional: values are only recognized if their
+module has already been imported.
+"""
+
+from base64 import b64encode
+import sys
+from typing import Optional
+
+# dtypes that can be decoded as JavaScript typed arrays
+_TYPED_ARRAY_DTYPES = {
+    "<f8",
+    "<f4",
+    "<i4",
+    "<i2",
+    "|i1",
+    "<u4",
+    "<u2",
+    "|u1",
+}
+
+
+def is_binary(value) -> bool:
+    """
+    Whether value is an array or table that export() encodes as binary
+    """
+    return is_ndarray(value) or _is_table(value) or _is_series(value)
+
+
+def encode_binary(value) -> Optional[dict]:
+    """
+    Returns the JSON-compatible encoding of an array, table or NumPy scalar,
+    or None if value is none of those
+    """
+    if is_ndarray(value):
+        return encode_ndarray(value)
+    if _is_series(value):
+        return encode_ndarray(value.to_numpy())
+    if _is_table(value):
+        return encode_table(value)
+
+    numpy = sys.modules.get("numpy")
+    if numpy is not None and isinstance(value, numpy.generic):
+        return value.item()
+
+    return None
+
+
+def encode_ndarray(array):
+    import numpy
+
+    kind = array.dtype.kind
+    if kind == "b":
+        array = array.astype(numpy.uint8)
+    elif kind in "iu" and array.dtype.itemsize == 8:
+        # JavaScript has no 64-bit integer typed arrays (besides BigInt), so
+        # use 32-bit integers when the values fit, and doubles otherwise
+        info = numpy.iinfo(numpy.int32)
+        if array.size == 0 or (array.min() >= info.min and array.max() <= info.max):
+            array = array.astype(numpy.int32)
+        else:
+            array = array.astype(numpy.float64)
+    elif kind == "f" and array.dtype.itemsize not in (4, 8):
+        array = array.astype(numpy.float64)
+    elif kind == "M":
+        array = array.astype("datetime64[ms]").astype(numpy.float64)
+    elif kind not in "iuf":
+        # Strings, objects, ... are sent as JSON
+        return array.tolist()
+
+    array = numpy.ascontiguousarray(array, dtype=array.dtype.newbyteorder("<"))
+    if array.dtype.str not in _TYPED_ARRAY_DTYPES:
+        array = array.astype(numpy.float64)
+
+    return {
+        "__ndarray__": True,
+        "dtype": array.dtype.str,
+        "shape": list(array.shape),
+        "data": b64encode(memoryview(array).cast("B")).decode("ascii"),
+    }
+
+
+def encode_table(table):
+    """
+    Encode a pandas DataFrame or Arrow table column by column
+    """
+    if _is_arrow_table(table):
+        columns = [str(name) for name in table.column_names]
+        data = {
+            name: encode_ndarray(table.column(i).to_numpy())
+            for i, name in enumerate(columns)
+        }
+        length = table.num_rows
+    else:
+        columns = [str(name) for name in table.columns]
+        data = {
+            name: encode_ndarray(table.iloc[:, i].to_numpy())
+            for i, name in enumerate(columns)
+        }
+        length = len(table)
+
+    return {
+        "__table__": True,
+        "columns": columns,
+        "data": data,
+        "length": length,
+    }
+
+
+def is_ndarray(value) -> bool:
+    numpy = sys.modules.get("numpy")
+    return numpy is not None and isinstance(value, numpy.ndarray)
+
+
+def _is_series(value):
+    pandas = sys.modules.get("pandas")
+    return pandas is not None and isinstance(value, pandas.Series)
+
+
+def _is_arrow_table(value):
+    pyarrow = sys.modules.get("pyarrow")
+    return pyarrow is not None and isinstance(value, pyarrow.Table)
+
+
+def _is_table(value):
+    pandas = sys.modules.get("pandas")
+    return _is_arrow_table(value) or (
+        pandas is not None and isinstance(value, pandas.DataFrame)
+    )
@@ -8,7 +8,8 @@ export const useWidgetModel = <M extends Record<string, any> = any>() => {
   // javascript objects.
 
   const proxify = (path: (string | number)[], value: any): any => {
-    if (!value || typeof value !== "object") {
+    if (!value || typeof value !== "object" || ArrayBuffer.isView(value)) {
+      // Primitives and typed arrays (decoded binary arrays) are used as-is
       return value;
     } else if (Array.isArray(value)) {
       return value.map((x, i) => proxify([...path, i], x));
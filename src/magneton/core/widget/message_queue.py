@@ -0,0 +1,163 @@
+from collections import deque
+from typing import Any, Deque, Dict, List, Literal, Optional, TypedDict
+
+BacklogPolicy = Literal["drop_oldest", "drop_newest", "coalesce"]
+
+
+class MessageLog:
+    """
+    Log of the messages sent by a widget, ordered by seq and shared by all of
+    its components (readers), each with its own cursor.
+
+    Messages are sent to every reader, or only to their target reader. Each
+    render only sends a reader the messages it was not sent yet, and readers
+    acknowledge them cumulatively, by seq. Messages are removed once every
+    reader acknowledged (or has no use for) them.
+
+    When max_backlog is set and that many messages are waiting, the policy
+    decides which message is lost:
+    - "drop_oldest": drop the oldest message.
+    - "drop_newest": drop the incoming message.
+    - "coalesce": replace the newest message of the same type and target
+      that was not sent to any reader yet, or drop the oldest message if
+      there is none.
+    """
+
+    def __init__(
+        self, max_backlog: Optional[int] = None, policy: BacklogPolicy = "drop_oldest"
+    ):
+        self.max_backlog = max_backlog
+        self.policy = policy
+        self.seq = 0
+        self.dropped = 0
+        self.__messages: Deque[Message] = deque()
+        self.__cursors: Dict[str, _Cursor] = {}
+
+    def add_reader(self, reader: str):
+        """
+        Start reading the messages sent from now on
+        """
+        self.__cursors[reader] = _Cursor(delivered=self.seq, acked=self.seq)
+
+    def remove_reader(self, reader: str):
+        if self.__cursors.pop(reader, None) is not None:
+            self.__truncate()
+
+    def __contains__(self, reader: str):
+        return reader in self.__cursors
+
+    def push(self, type: str, payload: Any, target: Optional[str] = None):
+        """
+        Send a message to every reader, or only to the target reader
+        """
+        if not self.__cursors or (target is not None and target not in self):
+            return
+
+        self.seq += 1
+        message = Message(type=type, payload=payload, seq=self.seq, target=target)
+        messages = self.__messages
+        if self.max_backlog is None or len(messages) < self.max_backlog:
+            messages.append(message)
+            return
+
+        self.dropped += 1
+        if self.policy == "drop_newest":
+            return
+
+        if self.policy == "coalesce":
+            delivered = max(cursor["delivered"] for cursor in self.__cursors.values())
+            for i in range(len(messages) - 1, -1, -1):
+                if messages[i]["seq"] <= delivered:
+                    break
+                if (
+                    messages[i]["type"] == message["type"]
+                    and messages[i]["target"] == target
+                ):
+                    del messages[i]
+                    messages.append(message)
+                    return
+
+        messages.popleft()
+        messages.append(message)
+
+    def ack(self, reader: str, seq: int):
+        """
+        Acknowledge every message up to and including seq
+        """
+        cursor = self.__cursors.get(reader)
+        if cursor is None:
+            return
+        cursor["acked"] = max(cursor["acked"], seq)
+        cursor["delivered"] = max(cursor["delivered"], cursor["acked"])
+        self.__truncate()
+
+    def undelivered(self, reader: str) -> List["Message"]:
+        """
+        Returns the messages not sent to the reader yet, in order
+        """
+        delivered = self.__cursors[reader]["delivered"]
+        pending = []
+        for message in reversed(self.__messages):
+            if message["seq"] <= delivered:
+                break
+            if message["target"] is None or message["target"] == reader:
+                pending.append(message)
+        pending.reverse()
+        return pending
+
+    def delivered(self, reader: str) -> int:
+        return self.__cursors[reader]["delivered"]
+
+    def mark_delivered(self, reader: str, seq: int):
+        cursor = self.__cursors[reader]
+        cursor["delivered"] = max(cursor["delivered"], seq)
+
+    def rewind(self, reader: str, seq: int):
+        """
+        Resend every unacknowledged message after seq on the next render
+        """
+        cursor = self.__cursors.get(reader)
+        if cursor is not None:
+            cursor["delivered"] = max(seq, cursor["acked"])
+
+    def pending(self, reader: str) -> int:
+        """
+        Returns the number of messages the reader did not acknowledge yet
+        """
+        acked = self.__cursors[reader]["acked"]
+        return sum(
+            1
+            for message in self.__messages
+            if message["seq"] > acked
+            and (message["target"] is None or message["target"] == reader)
+        )
+
+    def __len__(self):
+        return len(self.__messages)
+
+    def __truncate(self):
+        """
+        Remove the messages every reader acknowledged or is not a target of
+        """
+        messages = self.__messages
+        while messages:
+            message = messages[0]
+            if any(
+                message["seq"] > cursor["acked"]
+                and (message["target"] is None or message["target"] == reader)
+                for reader, cursor in self.__cursors.items()
+            ):
+                break
+            messages.popleft()
+
+
+class Message(TypedDict):
+    type: str
+    payload: Any
+    seq: int
+    target: Optional[str]
+
+
+class _Cursor(TypedDict):
+    delivered: int
+    acked: int
@@ -0,0 +1,129 @@
+from asyncio import get_running_loop
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+import pickle
+from typing import Callable, Literal, Mapping, Optional, Sequence, Union
+
+from .widget_model import WidgetModel
+from ...utils.snapshot import freeze
+
+ExecutorOption = Union[Literal["thread", "process"], Executor]
+
+_executors = {}
+
+
+def get_executor(executor: ExecutorOption) -> Executor:
+    """
+    Returns the given executor, or the shared thread/process pool
+    """
+    if isinstance(executor, Executor):
+        return executor
+    if executor not in ("thread", "process"):
+        raise ValueError(f"Unknown executor: {executor!r}")
+
+    if executor not in _executors:
+        pool = ThreadPoolExecutor if executor == "thread" else ProcessPoolExecutor
+        _executors[executor] = pool()
+    return _executors[executor]
+
+
+def offload(
+    fn: Callable,
+    executor: ExecutorOption,
+    get_state: Callable[[], WidgetModel],
+    reads: Optional[Sequence[str]] = None,
+):
+    """
+    Returns a coroutine function that calls fn(state, *args, **kwargs) on the
+    executor and applies the changes it returns to the live state.
+
+    fn receives a plain copy of the state, or only of the dotted paths in
+    reads (e.g. ["data.nodes"]), and returns None or a mapping of dotted
+    paths to their new values. Segments of paths that go through lists are
+    indices, e.g. "data.nodes.3.count"; lists read that way are selected as
+    dicts of the read items by index. For process pools, fn must be picklable (e.g.
+    a module-level function); the selected state is pickled on the event
+    loop, so only reads are shipped and the live model is never touched
+    from another thread.
+    """
+    pool = get_executor(executor)
+    in_process = isinstance(pool, ProcessPoolExecutor)
+
+    async def run(*args, **kwargs):
+        state = _select(WidgetModel.unproxy(get_state()), reads)
+        if in_process:
+            payload = pickle.dumps(
+                (fn, state, args, kwargs), protocol=pickle.HIGHEST_PROTOCOL
+            )
+            call = partial(_call_pickled, payload)
+        else:
+            call = partial(fn, freeze(state), *args, **kwargs)
+
+        changes = await get_running_loop().run_in_executor(pool, call)
+        if changes:
+            apply_changes(get_state(), changes)
+
+    return run
+
+
+def apply_changes(state: WidgetModel, changes: Mapping[str, object]):
+    """
+    Set each dotted path of changes in state, notifying observers once.
+    Raises KeyError if a path goes through a missing value.
+    """
+    with WidgetModel.batch(state):
+        for path, value in changes.items():
+            keys = _keys(WidgetModel.unproxy(state), path, new=True)
+            WidgetModel.set(state, keys, value, None)
+
+
+def _select(state: dict, reads: Optional[Sequence[str]]) -> dict:
+    if reads is None:
+        return state
+
+    selected = {}
+    for path in reads:
+        *parents, key = _keys(state, path)
+        source, target = state, selected
+        for parent in parents:
+            source = source[parent]
+            target = target.setdefault(parent, {})
+        target[key] = source[key]
+    return selected
+
+
+def _keys(state, path: str, new=False) -> list:
+    """
+    Keys of the dotted path in state, where segments that index lists are
+    ints. Raises KeyError naming the path if it goes through a missing value
+    or, unless new is set, if the value at path is missing.
+    """
+    segments = path.split(".")
+    keys = []
+    value = state
+    for i, segment in enumerate(segments):
+        last = i == len(segments) - 1
+        if isinstance(value, (list, tuple)):
+            try:
+                key = int(segment)
+                child = value[key]
+            except (ValueError, IndexError):
+                raise KeyError(f"no value at {path!r}") from None
+        elif isinstance(value, Mapping):
+            key = segment
+            if key not in value:
+                if last and new:
+                    keys.append(key)
+                    break
+                raise KeyError(f"no value at {path!r}")
+            child = value[key]
+        else:
+            raise KeyError(f"no value at {path!r}")
+        keys.append(key)
+        value = child
+    return keys
+
+
+def _call_pickled(payload: bytes):
+    fn, state, args, kwargs = pickle.loads(payload)
+    return fn(state, *args, **kwargs)
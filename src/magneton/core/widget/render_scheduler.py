@@ -0,0 +1,70 @@
+from asyncio import get_running_loop
+import time
+from typing import Callable, Dict, Optional
+
+from ...utils import metrics
+
+
+class RenderScheduler:
+    """
+    Collects render requests for the components of a widget and renders them
+    together in frames, at most max_frame_rate frames per second (or once per
+    event loop tick if max_frame_rate is None). Requests made while a frame
+    is pending are merged into it.
+    """
+
+    def __init__(
+        self,
+        render: Callable[[str], None],
+        max_frame_rate: Optional[float] = 60,
+        name: str = None,
+    ):
+        self.max_frame_rate = max_frame_rate
+        self.frames = 0
+        self.name = name
+        self.__render = render
+        # Time of the first request of each pending component
+        self.__pending: Dict[str, float] = {}
+        self.__handle = None
+        self.__last_frame: Optional[float] = None
+
+    def request(self, component_id: str):
+        self.__pending.setdefault(component_id, time.monotonic())
+        if self.__handle is not None:
+            return
+
+        try:
+            loop = get_running_loop()
+        except RuntimeError:
+            # No event loop to schedule on, so render right away
+            self.__frame()
+            return
+
+        delay = 0
+        if self.max_frame_rate and self.__last_frame is not None:
+            delay = self.__last_frame + 1 / self.max_frame_rate - time.monotonic()
+        if delay > 0:
+            self.__handle = loop.call_later(delay, self.__frame)
+        else:
+            self.__handle = loop.call_soon(self.__frame)
+
+    def cancel(self, component_id: str):
+        self.__pending.pop(component_id, None)
+
+    def __frame(self):
+        self.__handle = None
+        pending, self.__pending = self.__pending, {}
+        if not pending:
+            return
+
+        self.__last_frame = time.monotonic()
+        self.frames += 1
+        for component_id, requested in pending.items():
+            if metrics.ENABLED:
+                metrics.record(
+                    "render.latency",
+                    self.__last_frame - requested,
+                    widget=self.name,
+                    component=component_id,
+                )
+            self.__render(component_id)
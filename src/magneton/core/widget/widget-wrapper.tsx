@@ -13,6 +13,130 @@ export interface LayoutContext {
 
 type Message = { type: string; payload: any; seq: number };
 
+type Patch = {
+  v: number;
+  op: "add" | "replace" | "remove" | "splice" | "range";
+  path: (string | number)[];
+  value?: any;
+  start?: number;
+  deleteCount?: number;
+};
+
+const TYPED_ARRAYS: Record<string, any> = {
+  "<f8": Float64Array,
+  "<f4": Float32Array,
+  "<i4": Int32Array,
+  "<i2": Int16Array,
+  "|i1": Int8Array,
+  "<u4": Uint32Array,
+  "<u2": Uint16Array,
+  "|u1": Uint8Array,
+};
+
+const decodeBase64 = (data: string) => {
+  const binary = atob(data);
+  const bytes = new Uint8Array(binary.length);
+  for (let i = 0; i < binary.length; i++) bytes[i] = binary.charCodeAt(i);
+  return bytes.buffer;
+};
+
+/**
+ * Replaces the binary encodings of arrays and tables (see binary.py) with
+ * typed arrays. 1-D arrays become typed arrays, n-D arrays become
+ * { shape, data } and tables become { columns, data, length }
+ */
+export const decodeBinary = (value: any): any => {
+  if (!value || typeof value !== "object") {
+    return value;
+  } else if (Array.isArray(value)) {
+    return value.map(decodeBinary);
+  } else if (value.__ndarray__) {
+    const data = new TYPED_ARRAYS[value.dtype](decodeBase64(value.data));
+    return value.shape.length === 1 ? data : { shape: value.shape, data };
+  } else if (value.__table__) {
+    const data: Record<string, any> = {};
+    for (const column of value.columns) {
+      data[column] = decodeBinary(value.data[column]);
+    }
+    return { columns: value.columns, data, length: value.length };
+  } else {
+    const decoded: Record<string, any> = {};
+    for (const key of Object.keys(value)) decoded[key] = decodeBinary(value[key]);
+    return decoded;
+  }
+};
+
+/**
+ * Copies the objects along path and replaces the value at its end with
+ * update(value)
+ */
+const updateIn = (
+  m: any,
+  path: (string | number)[],
+  update: (value: any) => any,
+  i = 0
+): any => {
+  if (i === path.length) return update(m);
+  const copy = Array.isArray(m) ? [...m] : { ...m };
+  copy[path[i]] = updateIn(m[path[i]], path, update, i + 1);
+  return copy;
+};
+
+/**
+ * Replaces the values of an array in [start, start + values.length). Typed
+ * arrays are promoted to Float64Array when the new values do not fit, and
+ * n-D arrays ({ shape, data }) are indexed in row-major order
+ */
+const replaceRange = (array: any, start: number, values: any) => {
+  if (ArrayBuffer.isView(array)) {
+    const copy =
+      (values as any).constructor === (array as any).constructor
+        ? (array as any).slice()
+        : Float64Array.from(array as any);
+    copy.set(values, start);
+    return copy;
+  } else if (!Array.isArray(array) && array && ArrayBuffer.isView(array.data)) {
+    return { ...array, data: replaceRange(array.data, start, values) };
+  }
+  const copy = [...array];
+  for (let i = 0; i < values.length; i++) copy[start + i] = values[i];
+  return copy;
+};
+
+/**
+ * Applies JSON-patch-style operations to a model without mutating it, copying
+ * only the objects along each patched path
+ */
+export const applyPatches = (model: any, patches: Patch[]) =>
+  patches.reduce((model, { op, path, value, start = 0, deleteCount = 0 }) => {
+    // Splice and range patches target the array itself rather than a key
+    if (op === "splice") {
+      return updateIn(model, path, (array: any[]) =>
+        array.slice(0, start).concat(value, array.slice(start + deleteCount))
+      );
+    } else if (op === "range") {
+      return updateIn(model, path, (array: any) =>
+        replaceRange(array, start, value)
+      );
+    } else if (path.length === 0) {
+      return value;
+    }
+
+    return updateIn(model, path.slice(0, -1), (m: any) => {
+      const key = path[path.length - 1];
+      const copy = Array.isArray(m) ? [...m] : { ...m };
+      if (op === "remove") {
+        if (Array.isArray(copy)) copy.splice(key as number, 1);
+        else delete copy[key];
+      } else if (op === "add" && Array.isArray(copy)) {
+        copy.splice(key as number, 0, value);
+      } else {
+        copy[key] = value;
+      }
+      return copy;
+    });
+  }, model);
+
 export const WidgetWrapperContext = React.createContext<{
   model: any;
   updateModel: (path: (string | number)[], value: any) => void;
@@ -32,12 +156,20 @@ export const WidgetWrapper = ({
   layoutContext,
   clientId,
   messages,
+  messageBase,
   model,
+  modelVersion,
+  baseVersion,
+  patches,
 }: React.PropsWithChildren<{
   layoutContext: LayoutContext;
   clientId: string;
   messages: Message[];
+  messageBase: number;
   model: any;
+  modelVersion: number;
+  baseVersion: number | null;
+  patches: Patch[];
 }>) => {
   // Use an EventEmitter to simulate and listen for
   // messages from the back-end
@@ -55,11 +187,18 @@ export const WidgetWrapper = ({
     new Promise<any>((res) => receiver.once(type, res));
 
   // IDOM sends messages to the component by changing the
-  // lastMessage prop. This emits an event based on the
-  // received message
-  const messageAck = useRef(0);
+  // messages prop, which only holds messages sent after messageBase.
+  // This emits an event based on the received message. Components only
+  // receive the messages sent after they mounted, i.e. after messageBase
+  const messageAck = useRef(messageBase);
   useEffect(() => {
-    if (messages) {
+    if (messages && messages.length > 0) {
+      if (messageBase > messageAck.current) {
+        // A render was missed, so ask for the messages again
+        sendMessage("message_resend", messageAck.current);
+        return;
+      }
+
       messages.forEach((message) => {
         // broadcast message if not already seen
         if (message.seq > messageAck.current) {
@@ -68,17 +207,35 @@ export const WidgetWrapper = ({
         }
       });
 
-      // acknowledgement of last message
+      // cumulative acknowledgement of last message
       sendMessage("message_ack", messageAck.current);
     }
   }, [messages]);
 
   // Store the model parameters as state, and keep local model
-  // up to date with back-end model
-  const [localModel, setLocalModel] = React.useState(model);
+  // up to date with back-end model. The back-end sends a full snapshot
+  // on mount, and only the patches since the last sent version afterwards
+  const [localModel, setLocalModel] = React.useState(() =>
+    decodeBinary(model ?? {})
+  );
+  const localVersion = useRef(modelVersion);
   useEffect(() => {
-    setLocalModel(model);
-  }, [model]);
+    if (model !== null && model !== undefined) {
+      localVersion.current = modelVersion;
+      setLocalModel(decodeBinary(model));
+    } else if (modelVersion > localVersion.current) {
+      if (baseVersion === null || baseVersion > localVersion.current) {
+        // Some patches were missed, so ask for a snapshot
+        sendMessage("model_resync", localVersion.current);
+      } else {
+        const pending = patches
+          .filter((p) => p.v > localVersion.current)
+          .map((p) => ({ ...p, value: decodeBinary(p.value) }));
+        localVersion.current = modelVersion;
+        setLocalModel((model: any) => applyPatches(model, pending));
+      }
+    }
+  }, [model, modelVersion, patches]);
 
   // Helpers for using model
   const updateModel = (path: (number | string)[], value: any) => {
@@ -1,11 +1,15 @@
-from collections import defaultdict
+import json
+from time import perf_counter
 from traceback import format_tb
-from typing import Any, Callable, Dict, Mapping, List, TypedDict, Union
+from typing import Any, Callable, Dict, Mapping, List, Optional, Tuple, Union
 import idom
 from idom import component, use_effect, use_memo, use_state
 from shortuuid import uuid
+from .message_queue import BacklogPolicy, MessageLog
+from .render_scheduler import RenderScheduler
 from .widget_model import WidgetModel
 from ..idom_loader import load_component
+from ...utils import metrics
 from asyncio import Future, get_running_loop, iscoroutine
 
 
@@ -22,15 +26,20 @@ class WidgetBase:
         self.__component_ids = set()
         self.__updaters: Dict[str, Callable] = {}
 
-        self.__message_seq = 0
-        self.__message_queues: Dict[str, List[_Message]] = defaultdict(list, {})
+        self.__messages = MessageLog()
+        self.__drain_waiters: List[Tuple[int, Future]] = []
 
         self.__receivers = {}
 
         self.__render_count = 0
         self.__render_listeners = {}
+        self.__render_scheduler = RenderScheduler(self.__render, name=component_name)
+
+        # Last model version sent to each component
+        self.__model_versions: Dict[str, int] = {}
 
         self.__model = WidgetModel.proxy(model)
+        WidgetModel.set_metric_labels(self.__model, widget=component_name)
 
     # Helper functions for 2-way communication with component
     async def __recv_message(self, data):
@@ -44,10 +53,20 @@ class WidgetBase:
 
         if type == "message_ack":
             # Remove acknowledged messages
-            message_ack = payload
-            queue = self.__message_queues[component_id]
-            while queue != [] and queue[0]["seq"] <= message_ack:
-                queue.pop(0)
+            self.__messages.ack(component_id, payload)
+            self.__resolve_drain_waiters()
+            if metrics.ENABLED:
+                labels = {"widget": self.__component_name, "component": component_id}
+                metrics.record("messages.pending", len(self.__messages), **labels)
+                metrics.record(
+                    "messages.unacked", self.__messages.seq - payload, **labels
+                )
+
+        elif type == "message_resend":
+            # Component missed a render, so resend what it has not seen
+            self.__messages.rewind(component_id, payload)
+            if component_id in self.__updaters:
+                self.__update(component_id)
 
         elif type == "update_model":
             # Receive updates from component
@@ -56,6 +75,12 @@ class WidgetBase:
 
             WidgetModel.set(self.__model, path, value, tag=component_id)
 
+        elif type == "model_resync":
+            # Component missed some patches, so send a full snapshot
+            self.__model_versions.pop(component_id, None)
+            if component_id in self.__updaters:
+                self.__update(component_id)
+
         elif type == "call_func":
             # Call and return result from function
 
@@ -65,7 +90,8 @@ class WidgetBase:
 
             func = WidgetModel.get(self.__model, path)
 
-            self.send_message(return_id, await _call_capture(func, args))
+            # Only the calling component waits for the result
+            self.send_message(return_id, await _call_capture(func, args), component_id)
 
         # Notify any additional message receivers
         if type in self.__receivers:
@@ -89,30 +115,115 @@ class WidgetBase:
 
         return WidgetBase.MessageReceiverHandler(stop=stop)
 
-    def send_message(self, type, payload):
+    def send_message(self, type, payload, component_id: Optional[str] = None):
         """
-        Send a message to the component.
+        Send a message to every component, or only to the given one.
+
+        Messages are kept in a log shared by all components until they
+        acknowledge them. To avoid overwhelming slow components, bound the
+        log with set_message_backlog() and/or `await widget.drain()` before
+        sending.
         """
-        # Add messages to queue/trigger a re-render
-        self.__message_seq += 1
-        message_seq = self.__message_seq
-        for component_id in self.__component_ids:
-            queue = self.__message_queues[component_id]
-            queue.append(
-                {
-                    "type": type,
-                    "payload": payload,
-                    "seq": message_seq,
-                }
+        # Add message to log/trigger a re-render
+        self.__messages.push(type, payload, component_id)
+        if metrics.ENABLED:
+            metrics.record(
+                "messages.pending",
+                len(self.__messages),
+                widget=self.__component_name,
             )
+        if component_id is not None:
+            if component_id in self.__component_ids:
+                self.__update(component_id)
+            return
 
+        for component_id in self.__component_ids:
             self.__update(component_id)
 
+    def set_message_backlog(
+        self, max_backlog: Optional[int], policy: BacklogPolicy = "drop_oldest"
+    ):
+        """
+        Limit the number of unacknowledged messages kept in the log. See
+        MessageLog for the policies applied when the limit is reached.
+        """
+        self.__messages.max_backlog = max_backlog
+        self.__messages.policy = policy
+
+    def drain(self, max_pending: int = 0) -> Future:
+        """
+        Returns a future that resolves once every component has at most
+        max_pending unacknowledged messages
+        """
+        try:
+            future = get_running_loop().create_future()
+        except RuntimeError:
+            future = Future()
+
+        self.__drain_waiters.append((max_pending, future))
+        self.__resolve_drain_waiters()
+        return future
+
+    def __resolve_drain_waiters(self):
+        if not self.__drain_waiters:
+            return
+
+        pending = max(
+            (
+                self.__messages.pending(component_id)
+                for component_id in self.__component_ids
+            ),
+            default=0,
+        )
+        waiters = []
+        for max_pending, future in self.__drain_waiters:
+            if future.done():
+                continue
+            if pending <= max_pending:
+                future.set_result(None)
+            else:
+                waiters.append((max_pending, future))
+        self.__drain_waiters = waiters
+
     def __update(self, component_id):
-        update = self.__updaters[component_id]
-        update()
+        self.__render_scheduler.request(component_id)
+
+    def __render(self, component_id):
+        update = self.__updaters.get(component_id)
+        if update is not None:
+            update()
+
+    def set_max_frame_rate(self, max_frame_rate: Optional[float]):
+        """
+        Limit how often components re-render (60 times per second by
+        default). Updates requested in between are merged into the next
+        frame. None renders once per event loop tick.
+        """
+        self.__render_scheduler.max_frame_rate = max_frame_rate
+
+    def schedule_render(self):
+        """
+        Render every component in the next frame, without waiting for it
+        """
+        for component_id in self.__component_ids:
+            self.__update(component_id)
+
+    def batch(self):
+        """
+        Context manager that collapses every model change made inside it into
+        a single re-render of each component, e.g.
+
+        with widget.batch():
+            widget.model.state.a = 1
+            widget.model.state.b = 2
+        """
+        return WidgetModel.batch(self.__model)
 
     def flush(self):
+        """
+        Render every component in the next frame. Returns a future that
+        resolves once they all rendered.
+        """
         cb_id = uuid()
         component_ids = set(self.__component_ids)
 
@@ -121,12 +232,17 @@ class WidgetBase:
         except RuntimeError:
             future = Future()
 
+        if not component_ids:
+            future.set_result(None)
+            return future
+
         def cb(component_id):
             if component_id in component_ids:
                 component_ids.remove(component_id)
             if len(component_ids) == 0:
                 del self.__render_listeners[cb_id]
-                future.set_result(None)
+                if not future.done():
+                    future.set_result(None)
 
         self.__render_listeners[cb_id] = cb
 
@@ -135,8 +251,48 @@ class WidgetBase:
 
         return future
 
+    @property
+    def component_name(self) -> str:
+        return self.__component_name
+
+    def __sync_model(self, component_id):
+        """
+        Returns the model props for the given component: a full snapshot if
+        the component is new or has fallen behind, and otherwise the patches
+        recorded since the last version sent to it. Also returns the size of
+        the JSON of the model values they hold.
+        """
+        patch_log = WidgetModel.patches(self.__model)
+
+        base_version = self.__model_versions.get(component_id)
+        selected = None
+        if base_version is not None:
+            selected = patch_log.sized_since(base_version, exclude_tag=component_id)
+
+        self.__model_versions[component_id] = patch_log.version
+
+        if selected is None:
+            encoded = WidgetModel.export_json(self.__model)
+            props = {
+                "model": json.loads(encoded),
+                "modelVersion": patch_log.version,
+                "baseVersion": None,
+                "patches": [],
+            }
+            return props, len(encoded)
+
+        patches, nbytes = selected
+        props = {
+            "model": None,
+            "modelVersion": patch_log.version,
+            "baseVersion": base_version,
+            "patches": patches,
+        }
+        return props, nbytes
+
     @component
     def component(self):
+        render_start = perf_counter() if metrics.ENABLED else None
         component_id = use_memo(uuid, dependencies=[])
 
         # Used to manually trigger updates
@@ -149,26 +305,50 @@ class WidgetBase:
         def cleanup():
             self.__component_ids.remove(component_id)
             del self.__updaters[component_id]
-            del self.__message_queues[component_id]
+            self.__render_scheduler.cancel(component_id)
+            self.__messages.remove_reader(component_id)
+            self.__model_versions.pop(component_id, None)
+            WidgetModel.patches(self.__model).detach()
+            self.__resolve_drain_waiters()
+
+            # Unmounted components will not render, so stop waiting for them
+            for cb in list(self.__render_listeners.values()):
+                cb(component_id)
 
         def init():
             self.__component_ids.add(component_id)
             self.__updaters[component_id] = update
+            self.__messages.add_reader(component_id)
+            WidgetModel.patches(self.__model).attach()
             return cleanup
 
         use_effect(init, dependencies=[])
 
-        # Send messages to component via props
-        messages = list(self.__message_queues[component_id])
+        # Send messages not yet delivered to component via props
+        message_log = self.__messages
+        if component_id in message_log:
+            message_base = message_log.delivered(component_id)
+            messages = message_log.undelivered(component_id)
+            if messages:
+                message_log.mark_delivered(component_id, messages[-1]["seq"])
+        else:
+            # Not mounted yet
+            message_base = message_log.seq
+            messages = []
 
         # Synchronize model with component
-        model = WidgetModel.export(self.__model)
+        sync_start = perf_counter() if render_start is not None else None
+        model_props, model_bytes = self.__sync_model(component_id)
+        if sync_start is not None:
+            self.__record_export(
+                component_id, model_props, model_bytes, perf_counter() - sync_start
+            )
 
         # Trigger update when model changes
         def observe_model():
-            def cb(tag):
+            def cb(tag, change):
                 if tag != component_id:
-                    update()
+                    self.__update(component_id)
 
             observer_id = WidgetModel.observe(self.__model, cb)
             return lambda: WidgetModel.unobserve(self.__model, observer_id)
@@ -183,12 +363,13 @@ class WidgetBase:
         self.__render_count += 1
         use_effect(notify_render_listeners, [self.__render_count])
 
-        return load_component(self.__component_name)(
+        element = load_component(self.__component_name)(
             {
                 "wrapperProps": {
                     "clientId": component_id,
                     "messages": messages,
-                    "model": model,
+                    "messageBase": message_base,
+                    **model_props,
                 },
                 "componentProps": self.__props,
             },
@@ -200,6 +381,21 @@ class WidgetBase:
             },
         )
 
+        if render_start is not None:
+            metrics.record(
+                "render.seconds",
+                perf_counter() - render_start,
+                widget=self.__component_name,
+                component=component_id,
+            )
+        return element
+
+    def __record_export(self, component_id, model_props, model_bytes, seconds):
+        labels = {"widget": self.__component_name, "component": component_id}
+        metrics.record("export.seconds", seconds, **labels)
+        metrics.record("export.patches", len(model_props["patches"]), **labels)
+        metrics.record("export.bytes", model_bytes, **labels)
+
 
 async def _call_capture(func, args):
     """
@@ -214,9 +410,3 @@ async def _call_capture(func, args):
         error = str(e) + "\n" + "".join(format_tb(e.__traceback__))
 
     return value, error
-
-
-class _Message(TypedDict):
-    type: str
-    payload: Any
-    seq: int
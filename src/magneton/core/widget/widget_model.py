@@ -1,29 +1,477 @@
 from abc import ABC
+from asyncio import get_running_loop
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
 import json
-from typing import Callable, Sequence, Union
+from numbers import Integral
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
 from shortuuid import uuid
+from .binary import encode_binary, is_binary, is_ndarray
+from ...utils import metrics
+from ...utils.emitter import Subscription, weak_callable
+
+Path = Tuple[Union[str, int], ...]
+
+# When set, notifications are collected and dispatched once at the end of the
+# current event loop tick (see WidgetModel.coalesce)
+_coalesce_ticks: ContextVar[bool] = ContextVar("coalesce_ticks", default=False)
+
+
+class Change(NamedTuple):
+    """
+    Describes a single mutation of a model: the operation ("replace",
+    "remove", ...) and the path of the value that changed
+    """
+
+    op: str
+    path: Path
+
+
+class _WatchNode:
+    """
+    Node of the trie of watched paths
+    """
+
+    __slots__ = ("watchers", "children")
+
+    def __init__(self):
+        self.watchers = {}
+        self.children = {}
+
+    def collect(self, out: dict):
+        out.update(self.watchers)
+        for child in self.children.values():
+            child.collect(out)
+
+
+def _merge_changes(changes: List[Optional[Change]]) -> Optional[Change]:
+    """
+    Merge several changes into one located at their common ancestor
+    """
+    first = changes[0]
+    if all(change == first for change in changes):
+        return first
+    if any(change is None for change in changes):
+        return Change("update", ())
+
+    path = first.path
+    for change in changes[1:]:
+        n = 0
+        for a, b in zip(path, change.path):
+            if a != b:
+                break
+            n += 1
+        path = path[:n]
+    return Change("update", path)
 
 
 class Observable:
+    # Maximum number of proxies cached by path (see WidgetModel.proxy), and
+    # maximum length of their paths. Once the cache is full, proxies are only
+    # cached again after others are dropped.
+    MAX_CACHED_PROXIES = 1024
+    MAX_CACHED_DEPTH = 16
+
     def __init__(self):
         self.__observers = {}
+        self.__trackers = {}
+        self.__watch_root = _WatchNode()
+        self.__watch_paths = {}
+        self.__batch_depth = 0
+        self.__pending = []
+        self.__flush_scheduled = False
+        self.__dead_watchers = []
+        self.patches = PatchLog()
+        # Labels of the metrics of this model, e.g. the widget it belongs to
+        self.metric_labels: Dict[str, str] = {}
+        # Cached proxies by path (see WidgetModel.proxy), and the trie of
+        # their paths
+        self.__proxies: Dict[Path, "WidgetModel"] = {}
+        self.__proxy_paths = {}
+
+    # Callbacks registered with weak=True do not keep their function (or the
+    # object of a bound method) alive, and are removed once it is collected
 
-    def observe(self, cb: Callable) -> str:
+    def observe(self, cb: Callable, weak=False) -> str:
         observer_id = uuid()
+        if weak:
+            cb = weak_callable(cb, lambda: self.__observers.pop(observer_id, None))
         self.__observers[observer_id] = cb
         return observer_id
 
     def unobserve(self, observer_id: str):
-        del self.__observers[observer_id]
+        # Weak observers may already be gone
+        self.__observers.pop(observer_id, None)
+
+    def track(self, cb: Callable, weak=False) -> str:
+        """
+        Call cb(tag, change) synchronously for every change, even inside
+        batches. Meant for bookkeeping that cannot wait, e.g. dirty tracking.
+        """
+        tracker_id = uuid()
+        if weak:
+            cb = weak_callable(cb, lambda: self.__trackers.pop(tracker_id, None))
+        self.__trackers[tracker_id] = cb
+        return tracker_id
+
+    def untrack(self, tracker_id: str):
+        self.__trackers.pop(tracker_id, None)
+
+    def watch(self, path: Sequence[Union[str, int]], cb: Callable, weak=False) -> str:
+        """
+        Call cb(tag, change) whenever the value at the given path, one of its
+        descendants or one of its ancestors changes
+        """
+        watcher_id = uuid()
+        if weak:
+            # Pruning the trie is left to the next notification, as the
+            # collector may run while the trie is being walked
+            cb = weak_callable(cb, lambda: self.__dead_watchers.append(watcher_id))
+        node = self.__watch_root
+        for key in path:
+            node = node.children.setdefault(key, _WatchNode())
+        node.watchers[watcher_id] = cb
+        self.__watch_paths[watcher_id] = tuple(path)
+        return watcher_id
+
+    def unwatch(self, watcher_id: str):
+        path = self.__watch_paths.pop(watcher_id, None)
+        if path is None:
+            return
+
+        # Remove watcher, then prune any empty branches
+        nodes = [self.__watch_root]
+        for key in path:
+            nodes.append(nodes[-1].children[key])
+        del nodes[-1].watchers[watcher_id]
+        for key, parent, node in reversed(list(zip(path, nodes, nodes[1:]))):
+            if node.watchers or node.children:
+                break
+            del parent.children[key]
+
+    @contextmanager
+    def batch(self):
+        """
+        Defer notifications until the outermost batch exits, then notify each
+        observer/watcher once per tag
+        """
+        self.__batch_depth += 1
+        try:
+            yield
+        finally:
+            self.__batch_depth -= 1
+            if self.__batch_depth == 0:
+                self.__flush()
+
+    def cached_proxy(self, path: Path):
+        """
+        Returns the cached proxy of the value at path, or None
+        """
+        return self.__proxies.get(path)
+
+    def cache_proxy(self, path: Path, proxy):
+        """
+        Cache the proxy of the value at path, unless the cache is full
+        """
+        if len(self.__proxies) >= Observable.MAX_CACHED_PROXIES:
+            return
+        if path not in self.__proxies:
+            node = self.__proxy_paths
+            for key in path:
+                node = node.setdefault(key, {})
+        self.__proxies[path] = proxy
+
+    def uncache_proxies(self, path: Path):
+        """
+        Drop the cached proxies of the value at path and its descendants
+        """
+        if not self.__proxies:
+            return
+        if len(path) == 0:
+            self.__proxies.clear()
+            self.__proxy_paths.clear()
+            return
+
+        node = self.__proxy_paths
+        for key in path[:-1]:
+            node = node.get(key)
+            if node is None:
+                return
+        stack = [(path, node.pop(path[-1], {}))]
+        while stack:
+            path, node = stack.pop()
+            self.__proxies.pop(path, None)
+            stack.extend((path + (key,), child) for key, child in node.items())
+
+    def notify(self, tag, change: Change = None):
+        # Cached proxies of the changed value may hold a replaced subtree
+        self.uncache_proxies(() if change is None else change.path)
+
+        while self.__dead_watchers:
+            watcher_id = self.__dead_watchers.pop()
+            if watcher_id in self.__watch_paths:
+                self.unwatch(watcher_id)
+
+        for cb in list(self.__trackers.values()):
+            cb(tag, change)
+
+        if self.__batch_depth > 0:
+            self.__pending.append((tag, change))
+            return
+
+        self.__pending.append((tag, change))
+
+        if _coalesce_ticks.get():
+            if self.__flush_scheduled:
+                return
+            try:
+                get_running_loop().call_soon(self.__flush)
+                self.__flush_scheduled = True
+                return
+            except RuntimeError:
+                pass
+
+        self.__flush()
+
+    def __flush(self):
+        self.__flush_scheduled = False
+        if self.__batch_depth > 0:
+            return
+
+        pending, self.__pending = self.__pending, []
+
+        # Group changes by tag, preserving the order of first appearance
+        changes_by_tag = {}
+        for tag, change in pending:
+            changes_by_tag.setdefault(tag, []).append(change)
+
+        for tag, changes in changes_by_tag.items():
+            self.__dispatch(tag, changes)
+
+    def __dispatch(self, tag, changes: List[Optional[Change]]):
+        change = _merge_changes(changes)
+        observers = list(self.__observers.values())
+        for cb in observers:
+            cb(tag, change)
+
+        watchers = {}
+        if self.__watch_paths:
+            for change in changes:
+                for watcher_id, cb in self.__watchers_of(change).items():
+                    watchers.setdefault(watcher_id, (cb, []))[1].append(change)
+
+            for cb, watched_changes in watchers.values():
+                cb(tag, _merge_changes(watched_changes))
+
+        if metrics.ENABLED:
+            metrics.record(
+                "model.fanout", len(observers) + len(watchers), **self.metric_labels
+            )
+
+    def __watchers_of(self, change: Optional[Change]):
+        """
+        Returns watchers affected by a change: those watching the changed path,
+        an ancestor of it, or a descendant of it
+        """
+        node = self.__watch_root
+        watchers = {}
+        if change is None:
+            node.collect(watchers)
+            return watchers
 
-    def notify(self, tag):
-        for cb in self.__observers.values():
-            cb(tag)
+        watchers.update(node.watchers)
+        for key in change.path:
+            child = node.children.get(key)
+            if child is None and isinstance(key, str) and key.isdecimal():
+                # Numeric segments of dotted paths are watched as ints
+                child = node.children.get(int(key))
+            node = child
+            if node is None:
+                return watchers
+            watchers.update(node.watchers)
 
-    # TODO: watch/unwatch
+        for child in node.children.values():
+            child.collect(watchers)
+        return watchers
+
+
+class PatchLog:
+    """
+    Bounded log of JSON-patch-style operations applied to a model, keyed by
+    version number. Patches are only retained while at least one reader (i.e.
+    a mounted component) is attached.
+
+    Besides "add", "replace" and "remove", the log holds "splice" patches
+    (start, deleteCount and the inserted items) for lists and "range" patches
+    (start and the new values) for lists and arrays. Consecutive range patches
+    of the same container are merged, and their values are only read when
+    the patches are sent.
+    """
+
+    def __init__(self, max_size=1000):
+        self.version = 0
+        self.__entries = deque(maxlen=max_size)
+        self.__floor = 0
+        self.__readers = 0
+        self.__open_range = None
+
+    def attach(self):
+        self.__readers += 1
+
+    def detach(self):
+        self.__readers -= 1
+        if self.__readers <= 0:
+            self.__readers = 0
+            self.__entries.clear()
+            self.__open_range = None
+            self.__floor = self.version
+
+    def record(
+        self,
+        op: str,
+        path: Sequence[Union[str, int]],
+        value=None,
+        tag=None,
+        **fields,
+    ):
+        self.version += 1
+
+        if self.__readers == 0:
+            # Nobody is listening, so readers will need a snapshot anyway
+            self.__floor = self.version
+            return
+
+        patch = {"v": self.version, "op": op, "path": list(path), **fields}
+        nbytes = 0
+        if op != "remove":
+            encoded = WidgetModel.export_json(value)
+            patch["value"] = json.loads(encoded)
+            nbytes = len(encoded)
+
+        self.seal()
+        self.__append(patch, tag, nbytes)
+
+    def record_range(
+        self,
+        path: Sequence[Union[str, int]],
+        read: Callable[[int, int], object],
+        container,
+        start: int,
+        stop: int,
+        tag=None,
+    ):
+        """
+        Record that the values of a list or array in [start, stop) changed.
+        read(start, stop) returns the current values in that range.
+        """
+        self.version += 1
+
+        if self.__readers == 0:
+            self.__floor = self.version
+            return
+
+        open_range = self.__open_range
+        path = list(path)
+        if (
+            open_range is not None
+            and open_range["container"] is container
+            and open_range["tag"] == tag
+            and open_range["patch"]["path"] == path
+            and start <= open_range["stop"] + 64
+            and stop >= open_range["start"] - 64
+        ):
+            # Merge with the last patch, which gets the new version
+            self.__entries.pop()
+            open_range["start"] = min(start, open_range["start"])
+            open_range["stop"] = max(stop, open_range["stop"])
+            open_range["patch"]["v"] = self.version
+            self.__append(open_range["patch"], tag, 0)
+            return
+
+        self.seal()
+        patch = {"v": self.version, "op": "range", "path": path}
+        self.__open_range = {
+            "patch": patch,
+            "container": container,
+            "read": read,
+            "start": start,
+            "stop": stop,
+            "tag": tag,
+        }
+        self.__append(patch, tag, 0)
+
+    def __append(self, patch, tag, nbytes):
+        # nbytes is the size of the JSON of the value of the patch, which is
+        # only known once range patches are materialized
+        if len(self.__entries) == self.__entries.maxlen:
+            self.__floor = self.__entries[0][0]["v"]
+        self.__entries.append((patch, tag, nbytes))
+
+    def __materialize(self, open_range):
+        """
+        Returns the patch of a range with its current values, and the size
+        of their JSON
+        """
+        start, stop = open_range["start"], open_range["stop"]
+        encoded = WidgetModel.export_json(open_range["read"](start, stop))
+        patch = {**open_range["patch"], "start": start, "value": json.loads(encoded)}
+        return patch, len(encoded)
+
+    def seal(self):
+        """
+        Read the values of the pending range patch now. Must be called before
+        any change that moves the values of a list around.
+        """
+        if self.__open_range is not None:
+            open_range, self.__open_range = self.__open_range, None
+            patch, nbytes = self.__materialize(open_range)
+            open_range["patch"].update(patch)
+            # The open range is always the last entry
+            self.__entries[-1] = (open_range["patch"], open_range["tag"], nbytes)
+
+    def since(self, version: int, exclude_tag=None) -> Optional[List[dict]]:
+        """
+        Returns the patches recorded after the given version, or None if some
+        of them are no longer available (in which case a snapshot is needed)
+        """
+        selected = self.sized_since(version, exclude_tag)
+        return None if selected is None else selected[0]
+
+    def sized_since(
+        self, version: int, exclude_tag=None
+    ) -> Optional[Tuple[List[dict], int]]:
+        """
+        Like since(), but also returns the size of the JSON of the values of
+        the patches, as measured when they were exported
+        """
+        if version < self.__floor or version > self.version:
+            return None
+
+        open_patch = self.__open_range and self.__open_range["patch"]
+        patches = []
+        total = 0
+        for patch, tag, nbytes in self.__entries:
+            if patch["v"] <= version or (
+                exclude_tag is not None and tag == exclude_tag
+            ):
+                continue
+            if patch is open_patch:
+                patch, nbytes = self.__materialize(self.__open_range)
+            patches.append(patch)
+            total += nbytes
+        return patches, total
+
+
+_IMMUTABLE_TYPES = frozenset((int, float, str, bool, type(None)))
+
+# Whether each type seen by WidgetModel.has_instance is a WidgetModel
+_widget_model_types: Dict[type, bool] = {}
 
 
 class WidgetModel(ABC):
+    __slots__ = ("__target", "__tag", "__observable", "__path")
+
     @staticmethod
     def dict(target=None):
         if target is None:
@@ -41,15 +489,47 @@ class WidgetModel(ABC):
     @staticmethod
     def has_instance(obj):
         subclass = type(obj)
-        return any(
-            "_is_widget_model" in baseclass.__dict__ for baseclass in subclass.__mro__
-        )
+        try:
+            return _widget_model_types[subclass]
+        except KeyError:
+            is_model = any(
+                "_is_widget_model" in baseclass.__dict__
+                for baseclass in subclass.__mro__
+            )
+            _widget_model_types[subclass] = is_model
+            return is_model
 
     @staticmethod
-    def proxy(target, tag=None, source: "WidgetModel" = None, dotdict=False):
+    def proxy(target, tag=None, source: "WidgetModel" = None, dotdict=False, key=None):
+        if type(target) in _IMMUTABLE_TYPES:
+            return target
+        if source is None or tag is not None:
+            return WidgetModel.__create_proxy(target, tag, source, dotdict, key)
+
+        # Children of untagged proxies are cached by path in their observable,
+        # until the value at their path changes (see Observable.notify). A
+        # cached proxy is only reused if its target is still the value read.
+        observable = source.__observable
+        path = source.__path
+        if source.__tag is not None or len(path) >= Observable.MAX_CACHED_DEPTH:
+            return WidgetModel.__create_proxy(target, tag, source, dotdict, key)
+        path += (key,)
+        cached = observable.cached_proxy(path)
+        if cached is not None and cached.__target is target:
+            return cached
+
+        child = WidgetModel.__create_proxy(target, tag, source, dotdict, key)
+        if WidgetModel.has_instance(child):
+            observable.cache_proxy(path, child)
+        return child
+
+    @staticmethod
+    def __create_proxy(target, tag, source, dotdict, key):
         observable = None
+        path = ()
         if source is not None:
             observable = source.__observable
+            path = source.__path + (key,)
             if tag is None:
                 tag = source.__tag
 
@@ -57,16 +537,17 @@ class WidgetModel(ABC):
         if WidgetModel.has_instance(target):
             if observable is None:
                 observable = target.__observable
-            return type(target)(WidgetModel.unproxy(target), tag, observable)
+                path = target.__path
+            return type(target)(WidgetModel.unproxy(target), tag, observable, path)
         if isinstance(target, dict):
             if dotdict:
-                return DotDictProxy(target, tag, observable)
+                return DotDictProxy(target, tag, observable, path)
             else:
-                return DictProxy(target, tag, observable)
+                return DictProxy(target, tag, observable, path)
         if isinstance(target, list):
-            return ListProxy(target, tag, observable)
+            return ListProxy(target, tag, observable, path)
         if isinstance(target, tuple):
-            return TupleProxy(target, tag, observable)
+            return TupleProxy(target, tag, observable, path)
 
         # Known immutable/primitive types
         if (
@@ -76,6 +557,13 @@ class WidgetModel(ABC):
         ):
             return target
 
+        # Arrays and tables, which are exported as binary. Changes to tables
+        # are only tracked when they are replaced.
+        if is_ndarray(target):
+            return ArrayProxy(target, tag, observable, path)
+        if is_binary(target):
+            return target
+
         # Unknown types
         print(
             f"Warning: Possibly mutable type {type(target)} not recognized. Some changes might not be tracked."
@@ -84,24 +572,123 @@ class WidgetModel(ABC):
 
     @staticmethod
     def export(target: "WidgetModel"):
+        return json.loads(WidgetModel.export_json(target))
+
+    @staticmethod
+    def export_json(target: "WidgetModel") -> str:
+        """
+        Returns the JSON of the model sent to components (see export())
+        """
+
         def default(value):
             if callable(value):
                 return {"__callable__": True}
             if WidgetModel.has_instance(value):
                 return WidgetModel.export(value)
+            encoded = encode_binary(value)
+            if encoded is not None:
+                return encoded
 
             raise TypeError(f"cannot export data of type {type(value)}")
 
-        return json.loads(json.dumps(WidgetModel.unproxy(target), default=default))
+        return json.dumps(WidgetModel.unproxy(target), default=default)
 
     @staticmethod
-    def observe(target: "WidgetModel", cb: Callable):
-        return target.__observable.observe(cb)
+    def observe(target: "WidgetModel", cb: Callable, weak=False):
+        return target.__observable.observe(cb, weak)
 
     @staticmethod
     def unobserve(target: "WidgetModel", observer_id: str):
         target.__observable.unobserve(observer_id)
 
+    @staticmethod
+    def track(target: "WidgetModel", cb: Callable, weak=False):
+        return target.__observable.track(cb, weak)
+
+    @staticmethod
+    def untrack(target: "WidgetModel", tracker_id: str):
+        target.__observable.untrack(tracker_id)
+
+    @staticmethod
+    def watch(
+        target: "WidgetModel",
+        path: Union[str, Sequence[Union[str, int]]],
+        cb: Callable,
+        weak=False,
+    ):
+        """
+        Call cb(tag, change) only when the subtree at the given path (relative
+        to target) changes. Paths can be sequences of keys or dotted strings,
+        e.g. "state.data.nodes". Numeric segments of dotted strings match both
+        list indices and string keys, e.g. "state.data.nodes.0".
+        """
+        if isinstance(path, str):
+            path = [
+                int(key) if key.isdecimal() else key
+                for key in (path.split(".") if path else [])
+            ]
+        return target.__observable.watch(target.__path + tuple(path), cb, weak)
+
+    @staticmethod
+    def unwatch(target: "WidgetModel", watcher_id: str):
+        target.__observable.unwatch(watcher_id)
+
+    @staticmethod
+    def subscribe(
+        target: "WidgetModel",
+        cb: Callable,
+        path: Union[str, Sequence[Union[str, int]], None] = None,
+        weak=False,
+    ) -> Subscription:
+        """
+        Like observe() (or watch() when a path is given), but returns a
+        handle whose dispose() removes the callback
+        """
+        observable = target.__observable
+        if path is None:
+            observer_id = observable.observe(cb, weak)
+            return Subscription(lambda: observable.unobserve(observer_id))
+
+        watcher_id = WidgetModel.watch(target, path, cb, weak)
+        return Subscription(lambda: observable.unwatch(watcher_id))
+
+    @staticmethod
+    def batch(target: "WidgetModel"):
+        """
+        Context manager that collapses all notifications made inside it into
+        one notification per observer/watcher
+        """
+        return target.__observable.batch()
+
+    @staticmethod
+    @contextmanager
+    def coalesce():
+        """
+        Context manager that, for the current task, collects notifications
+        and dispatches them once at the end of each event loop tick
+        """
+        token = _coalesce_ticks.set(True)
+        try:
+            yield
+        finally:
+            _coalesce_ticks.reset(token)
+
+    @staticmethod
+    def patches(target: "WidgetModel") -> PatchLog:
+        return target.__observable.patches
+
+    @staticmethod
+    def set_metric_labels(target: "WidgetModel", **labels: str):
+        """
+        Label the metrics of the model (see utils.metrics), e.g. with the
+        widget it belongs to
+        """
+        target.__observable.metric_labels = labels
+
+    @staticmethod
+    def path(target: "WidgetModel") -> Path:
+        return target.__path
+
     @staticmethod
     def set(target: "WidgetModel", path: Sequence[Union[str, int]], value, tag):
         d = WidgetModel.proxy(target, tag=tag)
@@ -123,12 +710,80 @@ class WidgetModel(ABC):
             return target
 
     @staticmethod
-    def notify(target: "WidgetModel", tag=None):
+    def is_own_item(target: "WidgetModel", key, value) -> bool:
+        """
+        Whether value is the proxy of target's own item at key, e.g. when
+        assigning back after `model["items"] += [...]`, in which case the
+        proxy already recorded its changes. Proxies of the same object from
+        other models are not, since those models must still be notified.
+        """
+        return (
+            WidgetModel.has_instance(value)
+            and value.__observable is target.__observable
+            and value.__path == target.__path + (key,)
+            and target.__get_raw(key) is value.__target
+        )
+
+    @staticmethod
+    def notify(target: "WidgetModel", tag=None, change: Change = None):
         if tag is None:
             tag = target.__tag
-        target.__observable.notify(target.__tag)
+        if change is None:
+            change = Change("update", target.__path)
+        target.__observable.notify(tag, change)
+
+    @staticmethod
+    def record(target: "WidgetModel", op: str, key, value=None):
+        """
+        Record a change to the given key of the target in the patch log and
+        notify observers of the changed path
+        """
+        path = target.__path + (key,)
+        target.__observable.patches.record(op, path, value, target.__tag)
+        target.__observable.notify(target.__tag, Change(op, path))
+
+    @staticmethod
+    def record_splice(target: "WidgetModel", start: int, delete_count: int, items=()):
+        """
+        Record that delete_count items of the target list were replaced with
+        items at the given index
+        """
+        path = target.__path
+        target.__observable.patches.record(
+            "splice",
+            path,
+            list(items),
+            target.__tag,
+            start=start,
+            deleteCount=delete_count,
+        )
+        target.__observable.notify(target.__tag, Change("splice", path))
 
-    def __init__(self, target={}, tag=None, observable: Observable = None):
+    @staticmethod
+    def record_range(
+        target: "WidgetModel", start: int, stop: int, read: Callable = None
+    ):
+        """
+        Record that the values of the target list or array in [start, stop)
+        changed. The values, read(start, stop) if given or a slice of the
+        target otherwise, are only exported when the patch is sent.
+        """
+        path = target.__path
+        container = target.__target
+        if read is None:
+            read = lambda start, stop: container[start:stop]
+        target.__observable.patches.record_range(
+            path, read, container, start, stop, target.__tag
+        )
+        target.__observable.notify(target.__tag, Change("range", path))
+
+    def __init__(
+        self,
+        target={},
+        tag=None,
+        observable: Observable = None,
+        path: Sequence[Union[str, int]] = (),
+    ):
         if observable is None:
             observable = Observable()
 
@@ -137,30 +792,52 @@ class WidgetModel(ABC):
         self.__target = target
         self.__tag = tag
         self.__observable = observable
+        self.__path = tuple(path)
 
     ##############################
     # Proxied Collection Methods #
     ##############################
 
     def __setitem__(self, key, value):
-        self.__target.__setitem__(key, value)
-        self.__observable.notify(self.__tag)
+        if WidgetModel.is_own_item(self, key, value):
+            return
+        raw = WidgetModel.unproxy(value)
+        self.__target.__setitem__(key, raw)
+        WidgetModel.record(self, "replace", key, raw)
+
+    def __get_raw(self, key):
+        try:
+            return self.__target[key]
+        except (KeyError, IndexError, TypeError):
+            return None
 
     def __delitem__(self, key):
         self.__target.__delitem__(key)
-        self.__observable.notify(self.__tag)
+        WidgetModel.record(self, "remove", key)
 
-    def __getitem__(self, *args, **kwargs):
-        value = self.__target.__getitem__(*args, **kwargs)
-        return WidgetModel.proxy(value, source=self)
+    def __getitem__(self, key):
+        value = self.__target.__getitem__(key)
+        if isinstance(key, slice):
+            # Slices are copies, so changes to them are not tracked
+            return value
+        return WidgetModel.proxy(value, source=self, key=key)
 
-    def __iter__(self, *args, **kwargs):
-        for x in self.__target.__iter__(*args, **kwargs):
-            yield WidgetModel.proxy(x, source=self)
+    def __iter__(self):
+        if isinstance(self.__target, (list, tuple)):
+            for i, x in enumerate(self.__target):
+                yield WidgetModel.proxy(x, source=self, key=i)
+        else:
+            for x in self.__target:
+                yield WidgetModel.proxy(x, source=self, key=x)
 
-    def __reversed__(self, *args, **kwargs):
-        for x in self.__target.__reversed__(*args, **kwargs):
-            yield WidgetModel.proxy(x, source=self)
+    def __reversed__(self):
+        if isinstance(self.__target, (list, tuple)):
+            n = len(self.__target)
+            for i, x in enumerate(reversed(self.__target)):
+                yield WidgetModel.proxy(x, source=self, key=n - 1 - i)
+        else:
+            for x in reversed(self.__target):
+                yield WidgetModel.proxy(x, source=self, key=x)
 
     def __len__(self, *args, **kwargs):
         return self.__target.__len__(*args, **kwargs)
@@ -197,26 +874,29 @@ class WidgetModel(ABC):
 
 
 class DictProxy(WidgetModel):
+    __slots__ = ()
+
     def update(self, *args, **kwargs):
-        WidgetModel.unproxy(self).update(*args, **kwargs)
-        WidgetModel.notify(self)
+        changes = dict(*args, **kwargs)
+        WidgetModel.unproxy(self).update(changes)
+        with WidgetModel.batch(self):
+            for key, value in changes.items():
+                WidgetModel.record(self, "replace", key, value)
 
 
 class DotDictProxy(WidgetModel):
-    __initialized = False
-
-    def __init__(self, *args, **kwargs):
-        self.__initialized = False
-        super().__init__(*args, **kwargs)
-        self.__initialized = True
+    __slots__ = ()
 
     def __setattr__(self, key, value):
-        if not self.__initialized:
+        if key.startswith("_WidgetModel__"):
+            # Internal slots
             super().__setattr__(key, value)
         else:
             self[key] = value
 
     def __getattr__(self, key):
+        if key.startswith("_WidgetModel__"):
+            raise AttributeError(key)
         return self[key]
 
     def __getitem__(self, key):
@@ -224,12 +904,228 @@ class DotDictProxy(WidgetModel):
         if key not in target:
             return None
 
-        return WidgetModel.proxy(target[key], source=self, dotdict=True)
+        return WidgetModel.proxy(target[key], source=self, dotdict=True, key=key)
 
 
 class ListProxy(WidgetModel):
-    pass
+    """
+    Records list mutations as splices, and item assignments as ranges, so that
+    only the changed items are sent to the frontend
+    """
+
+    __slots__ = ()
+
+    def __setitem__(self, key, value):
+        target = WidgetModel.unproxy(self)
+        if not isinstance(key, slice):
+            if WidgetModel.is_own_item(self, key, value):
+                return
+            key = _normalize_index(key, len(target))
+            raw = WidgetModel.unproxy(value)
+            target[key] = raw
+            WidgetModel.record_range(self, key, key + 1)
+            return
+
+        start, stop, step = key.indices(len(target))
+        items = [WidgetModel.unproxy(item) for item in value]
+        WidgetModel.patches(self).seal()
+        target[key] = items
+        if step == 1:
+            WidgetModel.record_splice(self, start, max(stop - start, 0), items)
+        elif items:
+            indices = range(start, stop, step)
+            WidgetModel.record_range(self, min(indices), max(indices) + 1)
+
+    def __delitem__(self, key):
+        target = WidgetModel.unproxy(self)
+        WidgetModel.patches(self).seal()
+        if not isinstance(key, slice):
+            key = _normalize_index(key, len(target))
+            del target[key]
+            WidgetModel.record_splice(self, key, 1)
+            return
+
+        start, stop, step = key.indices(len(target))
+        indices = range(start, stop, step)
+        if not indices:
+            return
+        lo, hi = min(indices), max(indices) + 1
+        del target[key]
+        WidgetModel.record_splice(self, lo, hi - lo, target[lo : hi - len(indices)])
+
+    def append(self, item):
+        self.insert(len(self), item)
+
+    def extend(self, items):
+        target = WidgetModel.unproxy(self)
+        items = [WidgetModel.unproxy(item) for item in items]
+        start = len(target)
+        target.extend(items)
+        WidgetModel.record_splice(self, start, 0, items)
+
+    def insert(self, index, item):
+        target = WidgetModel.unproxy(self)
+        index = min(max(index + len(target) if index < 0 else index, 0), len(target))
+        item = WidgetModel.unproxy(item)
+        WidgetModel.patches(self).seal()
+        target.insert(index, item)
+        WidgetModel.record_splice(self, index, 0, [item])
+
+    def pop(self, index=-1):
+        target = WidgetModel.unproxy(self)
+        index = _normalize_index(index, len(target))
+        WidgetModel.patches(self).seal()
+        item = target.pop(index)
+        WidgetModel.record_splice(self, index, 1)
+        return item
+
+    def remove(self, item):
+        del self[WidgetModel.unproxy(self).index(WidgetModel.unproxy(item))]
+
+    def clear(self):
+        target = WidgetModel.unproxy(self)
+        n = len(target)
+        WidgetModel.patches(self).seal()
+        target.clear()
+        WidgetModel.record_splice(self, 0, n)
+
+    def sort(self, *args, **kwargs):
+        self.__reorder(lambda target: target.sort(*args, **kwargs))
+
+    def reverse(self):
+        self.__reorder(lambda target: target.reverse())
+
+    def __reorder(self, reorder):
+        target = WidgetModel.unproxy(self)
+        WidgetModel.patches(self).seal()
+        reorder(target)
+        WidgetModel.record_splice(self, 0, len(target), target)
+
+    def __iadd__(self, items):
+        self.extend(items)
+        return self
+
+    def __imul__(self, n):
+        target = WidgetModel.unproxy(self)
+        if n <= 0:
+            self.clear()
+        elif n > 1:
+            self.extend(target * (n - 1))
+        return self
 
 
 class TupleProxy(WidgetModel):
-    pass
+    __slots__ = ()
+
+
+class ArrayProxy(WidgetModel):
+    """
+    Proxy for NumPy arrays that records item and slice assignments as ranges
+    of the flattened array. Other attributes and NumPy functions operate on
+    the array itself.
+    """
+
+    __slots__ = ()
+
+    def __getattr__(self, name):
+        if name.startswith("_WidgetModel__"):
+            raise AttributeError(name)
+        return getattr(WidgetModel.unproxy(self), name)
+
+    def __array__(self, *args, **kwargs):
+        return WidgetModel.unproxy(self).__array__(*args, **kwargs)
+
+    def __getitem__(self, key):
+        return WidgetModel.unproxy(self)[key]
+
+    def __iter__(self):
+        return iter(WidgetModel.unproxy(self))
+
+    def __setitem__(self, key, value):
+        array = WidgetModel.unproxy(self)
+        array[WidgetModel.unproxy(key)] = WidgetModel.unproxy(value)
+        self.__record(key)
+
+    def __record(self, key=None):
+        array = WidgetModel.unproxy(self)
+        if array.dtype.kind not in "biufM" and array.ndim > 1:
+            # Exported as nested lists, which cannot be patched by flat range
+            path = WidgetModel.path(self)
+            WidgetModel.patches(self).record("replace", path, array)
+            WidgetModel.notify(self, change=Change("replace", path))
+            return
+
+        start, stop = 0, array.size
+        if array.ndim == 1 and isinstance(key, Integral):
+            start = key + len(array) if key < 0 else key
+            stop = start + 1
+        elif array.ndim == 1 and isinstance(key, slice):
+            indices = range(*key.indices(len(array)))
+            if not indices:
+                return
+            start, stop = min(indices), max(indices) + 1
+
+        WidgetModel.record_range(
+            self, start, stop, lambda start, stop: array.reshape(-1)[start:stop]
+        )
+
+    def __iop(name):
+        def iop(self, other):
+            getattr(WidgetModel.unproxy(self), name)(WidgetModel.unproxy(other))
+            self.__record()
+            return self
+
+        iop.__name__ = name
+        return iop
+
+    __iadd__ = __iop("__iadd__")
+    __isub__ = __iop("__isub__")
+    __imul__ = __iop("__imul__")
+    __itruediv__ = __iop("__itruediv__")
+    __ifloordiv__ = __iop("__ifloordiv__")
+    __ipow__ = __iop("__ipow__")
+    __imod__ = __iop("__imod__")
+    __iand__ = __iop("__iand__")
+    __ior__ = __iop("__ior__")
+    __ixor__ = __iop("__ixor__")
+    del __iop
+
+    def __forward(name):
+        def forward(self, *args):
+            return getattr(WidgetModel.unproxy(self), name)(
+                *(WidgetModel.unproxy(arg) for arg in args)
+            )
+
+        forward.__name__ = name
+        return forward
+
+    __eq__ = __forward("__eq__")
+    __ne__ = __forward("__ne__")
+    __lt__ = __forward("__lt__")
+    __le__ = __forward("__le__")
+    __gt__ = __forward("__gt__")
+    __ge__ = __forward("__ge__")
+    __add__ = __forward("__add__")
+    __sub__ = __forward("__sub__")
+    __rsub__ = __forward("__rsub__")
+    __truediv__ = __forward("__truediv__")
+    __rtruediv__ = __forward("__rtruediv__")
+    __floordiv__ = __forward("__floordiv__")
+    __pow__ = __forward("__pow__")
+    __mod__ = __forward("__mod__")
+    __matmul__ = __forward("__matmul__")
+    __and__ = __forward("__and__")
+    __or__ = __forward("__or__")
+    __invert__ = __forward("__invert__")
+    __neg__ = __forward("__neg__")
+    __abs__ = __forward("__abs__")
+    __hash__ = None
+    del __forward
+
+
+def _normalize_index(index: int, length: int) -> int:
+    if index < 0:
+        index += length
+    if not 0 <= index < length:
+        raise IndexError("list index out of range")
+    return index
@@ -1,7 +1,24 @@
+from asyncio import Semaphore, gather, get_running_loop, wait, wrap_future
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import json as jsonlib
+from threading import Lock
+from time import perf_counter
+from typing import (Any, AsyncIterator, Dict, Iterator, List, Mapping,
+                    MutableSequence, NamedTuple, Optional)
+from urllib.parse import urlsplit
+from weakref import WeakKeyDictionary
+
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3 import Retry
-from .constants import REQUEST_TIMEOUT_SECONDS
+from .constants import (CACHE_INVALIDATING_ENDPOINTS, REQUEST_TIMEOUT_SECONDS,
+                        SERVICE_ENDPOINTS)
+from .response_cache import (ResponseCache, copy_response, endpoint_of,
+                             request_key)
+from .utils import metrics
+from .utils.json_stream import iter_json_array
+from .utils.single_flight import SingleFlight
 
 
 def requests_retry_session(
@@ -9,6 +26,8 @@ def requests_retry_session(
         backoff_factor=0.3,
         status_forcelist=(500, 502, 504),
         session=None,
+        pool_connections=10,
+        pool_maxsize=10,
 ):
     session = session or requests.Session()
     retry = Retry(
@@ -18,33 +37,384 @@ def requests_retry_session(
         backoff_factor=backoff_factor,
         status_forcelist=status_forcelist,
     )
-    adapter = HTTPAdapter(max_retries=retry)
+    adapter = HTTPAdapter(max_retries=retry,
+                          pool_connections=pool_connections,
+                          pool_maxsize=pool_maxsize)
     session.mount('http://', adapter)
     session.mount('https://', adapter)
     return session
 
 
+class ServiceRequest(NamedTuple):
+    """
+    A request to one of the SERVICE_ENDPOINTS. params fill in the
+    placeholders of the endpoint path, e.g. {nodetype}.
+    """
+    endpoint: str
+    json: Any = None
+    method: str = 'get'
+    params: Optional[Mapping[str, Any]] = None
+
+
+class ServiceClient:
+    """
+    HTTP client that keeps its connections alive and shares them between
+    calls. Every host gets a pool of up to max_connections_per_host
+    connections, and async calls run on a thread pool of max_connections
+    workers so that they never block the event loop.
+
+    When a cache is given, responses of read-only endpoints are served from
+    it (see ResponseCache). Identical requests that are in flight at the same
+    time share one HTTP call, unless dedupe is False or they change the
+    corpus; single_flight.hits/misses count the shared and sent requests.
+    Requests are only shared with requests of the same kind: request() with
+    request() calls from other threads, arequest() with arequest() calls on
+    the same event loop. Each caller gets its own copy of the response.
+    """
+
+    def __init__(self,
+                 base_url='',
+                 max_connections=16,
+                 max_connections_per_host=8,
+                 retries=0,
+                 timeout=REQUEST_TIMEOUT_SECONDS,
+                 cache: Optional[ResponseCache] = None,
+                 dedupe=True):
+        self.base_url = base_url.rstrip('/')
+        self.cache = cache
+        self.single_flight = (SingleFlight(copy=copy_response)
+                              if dedupe else None)
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.timeout = timeout
+        self.__retries = retries
+        self.__session = None
+        self.__executor = None
+        self.__lock = Lock()
+        # Per-host semaphores of each event loop
+        self.__host_limits = WeakKeyDictionary()
+
+    @property
+    def session(self) -> requests.Session:
+        with self.__lock:
+            if self.__session is None:
+                self.__session = requests_retry_session(
+                    retries=self.__retries,
+                    pool_connections=self.max_connections,
+                    pool_maxsize=self.max_connections_per_host)
+            return self.__session
+
+    def url(self, endpoint: str, **params) -> str:
+        """
+        Returns the URL of one of the SERVICE_ENDPOINTS, or of the given path.
+        Endpoints and relative paths need the client's base_url.
+        """
+        path = SERVICE_ENDPOINTS.get(endpoint, endpoint)
+        if params:
+            path = path.format(**params)
+        if urlsplit(path).scheme:
+            return path
+        if not self.base_url:
+            raise ValueError(
+                f'{endpoint!r} resolves to the relative URL {path!r}: set the '
+                'base_url of the client, e.g. '
+                'get_client().base_url = "http://localhost:8000"')
+        return self.base_url + path
+
+    def request(self, method: str, path: str, json=None) -> requests.Response:
+        url = self.url(path)
+        with metrics.fetching():
+            if not self.__dedupes(url):
+                return self.__request(method, url, json)
+            return self.single_flight.do(
+                request_key(method, url, json),
+                lambda: self.__request(method, url, json))
+
+    def __request(self, method: str, url: str, json) -> requests.Response:
+        if self.cache is not None:
+            response = self.cache.get(method, url, json)
+            if response is not None:
+                return response
+
+        start = perf_counter()
+        try:
+            response = self.session.request(method,
+                                            url,
+                                            json=json,
+                                            timeout=self.timeout)
+        except requests.ConnectTimeout as ex:
+            raise Exception('{}: {}'.format(ex.__class__.__name__,
+                                            '408 Request Timeout'))
+        finally:
+            if metrics.ENABLED:
+                metrics.record('http.seconds',
+                               perf_counter() - start,
+                               endpoint=endpoint_of(url)
+                               or urlsplit(url).path,
+                               method=method.lower())
+
+        if self.cache is not None:
+            self.cache.update(method, url, json, response)
+        return response
+
+    def get(self, path: str, json=None) -> requests.Response:
+        return self.request('get', path, json)
+
+    def post(self, path: str, json=None) -> requests.Response:
+        return self.request('post', path, json)
+
+    async def arequest(self, method: str, path: str,
+                       json=None) -> requests.Response:
+        """
+        Same as request(), but runs on the client's thread pool
+        """
+        loop = get_running_loop()
+        url = self.url(path)
+
+        async def send():
+            async with self.__host_limit(loop, urlsplit(url).netloc):
+                return await loop.run_in_executor(self.__get_executor(),
+                                                  self.__request, method, url,
+                                                  json)
+
+        with metrics.fetching():
+            if not self.__dedupes(url):
+                return await send()
+            return await self.single_flight.ado(
+                request_key(method, url, json), send)
+
+    async def aget(self, path: str, json=None) -> requests.Response:
+        return await self.arequest('get', path, json)
+
+    async def apost(self, path: str, json=None) -> requests.Response:
+        return await self.arequest('post', path, json)
+
+    async def batch(
+        self, calls: Mapping[Any, ServiceRequest]
+    ) -> Dict[Any, requests.Response]:
+        """
+        Send several requests in parallel and return their responses by key.
+        Endpoints are resolved against the client's base_url, e.g.
+
+            client = ServiceClient(base_url='http://localhost:8000')
+            await client.batch({
+                'nodes': ServiceRequest('get_node_distribution', payload),
+                'relations': ServiceRequest('get_relation_distribution',
+                                            payload),
+            })
+        """
+        responses = await gather(*(self.arequest(
+            call.method, self.url(call.endpoint, **(call.params or {})),
+            call.json) for call in calls.values()))
+        return dict(zip(calls, responses))
+
+    def stream(self,
+               method: str,
+               path: str,
+               json=None,
+               chunk_size=64 * 1024) -> Iterator:
+        """
+        Yield the records of a response as it arrives: one per line of NDJSON
+        responses, or one per item of JSON array responses. Streamed
+        responses are not cached.
+        """
+        response = self.__open_stream(method, path, json)
+        with response:
+            yield from _iter_records(response, chunk_size)
+
+    def __open_stream(self, method: str, path: str,
+                      json=None) -> requests.Response:
+        try:
+            response = self.session.request(method,
+                                            self.url(path),
+                                            json=json,
+                                            timeout=self.timeout,
+                                            stream=True)
+        except requests.ConnectTimeout as ex:
+            raise Exception('{}: {}'.format(ex.__class__.__name__,
+                                            '408 Request Timeout'))
+        try:
+            response.raise_for_status()
+        except BaseException:
+            response.close()
+            raise
+        return response
+
+    async def astream(self,
+                      method: str,
+                      path: str,
+                      json=None,
+                      page_size=1000,
+                      first_page_size=100) -> AsyncIterator[List]:
+        """
+        Yield the records of a response in pages, reading the response on the
+        client's thread pool. Pages start at first_page_size records, so the
+        first rows can be shown early, and double up to page_size.
+
+        If the consumer is cancelled while a page is being read, the response
+        is closed to stop the read, which is waited for before cancelling.
+        """
+        loop = get_running_loop()
+        url = self.url(path)
+        executor = self.__get_executor()
+        size = min(first_page_size, page_size)
+        async with self.__host_limit(loop, urlsplit(url).netloc):
+            response = await loop.run_in_executor(executor,
+                                                  self.__open_stream, method,
+                                                  url, json)
+            records = _iter_records(response)
+            # Read of the current page, which cancelling the consumer does not
+            # stop (unlike the asyncio future awaiting it)
+            read = None
+            try:
+                while True:
+                    read = executor.submit(list, islice(records, size))
+                    page = await wrap_future(read)
+                    if not page:
+                        return
+                    yield page
+                    size = min(size * 2, page_size)
+            finally:
+                if read is not None and not read.done():
+                    response.close()
+                    pending = wrap_future(read)
+                    await wait([pending])
+                    # The read is expected to fail once the response is closed
+                    pending.exception()
+                records.close()
+                response.close()
+
+    async def stream_into(self,
+                          target: MutableSequence,
+                          method: str,
+                          path: str,
+                          json=None,
+                          **kwargs) -> int:
+        """
+        Append the records of a response to a list, e.g. a list in a widget
+        model, page by page so that each page is rendered as it arrives.
+        Returns the number of records.
+
+            await get_client().stream_into(self.state.edges, 'get',
+                                           'get_edge_list', body)
+        """
+        count = 0
+        async for page in self.astream(method, path, json, **kwargs):
+            target.extend(page)
+            count += len(page)
+        return count
+
+    def close(self):
+        with self.__lock:
+            if self.__session is not None:
+                self.__session.close()
+                self.__session = None
+            if self.__executor is not None:
+                self.__executor.shutdown(wait=False)
+                self.__executor = None
+
+    def __dedupes(self, url: str) -> bool:
+        return (self.single_flight is not None
+                and endpoint_of(url) not in CACHE_INVALIDATING_ENDPOINTS)
+
+    def __get_executor(self):
+        with self.__lock:
+            if self.__executor is None:
+                self.__executor = ThreadPoolExecutor(
+                    self.max_connections, thread_name_prefix='magneton-http')
+            return self.__executor
+
+    def __host_limit(self, loop, host: str) -> Semaphore:
+        limits = self.__host_limits.setdefault(loop, {})
+        if host not in limits:
+            limits[host] = Semaphore(self.max_connections_per_host)
+        return limits[host]
+
+
+def _iter_records(response: requests.Response, chunk_size=64 * 1024):
+    """
+    Yield the records of a streamed response (see ServiceClient.stream)
+    """
+    chunks = _iter_chunks(response, chunk_size)
+    content_type = response.headers.get('Content-Type', '')
+    if any(t in content_type for t in ('ndjson', 'jsonl', 'json-seq')):
+        rest = b''
+        for chunk in chunks:
+            *lines, rest = (rest + chunk).split(b'\n')
+            for line in lines:
+                if line.strip():
+                    yield jsonlib.loads(line)
+        if rest.strip():
+            yield jsonlib.loads(rest)
+    else:
+        yield from iter_json_array(chunks)
+
+
+def _iter_chunks(response: requests.Response, chunk_size: int):
+    """
+    Yield the body of a streamed response as soon as data arrives, instead
+    of waiting for chunk_size bytes as iter_content() does
+    """
+    raw = response.raw
+    if not hasattr(raw, 'read1'):  # urllib3 < 2
+        yield from response.iter_content(chunk_size)
+        return
+
+    while True:
+        chunk = raw.read1(chunk_size, decode_content=True)
+        if not chunk:
+            return
+        yield chunk
+
+
+_client = None
+
+
+def get_client() -> ServiceClient:
+    """
+    Returns the client shared by get_request() and post_request(). It has no
+    base_url, so it only takes absolute URLs unless given one, e.g.
+
+        get_client().base_url = 'http://localhost:8000'
+
+    It does not cache responses unless given a cache, e.g.
+
+        get_client().cache = ResponseCache(
+            disk_dir=Path("~/.cache/magneton").expanduser())
+
+    Cached responses are served until they expire (see CACHE_TTL_SECONDS),
+    even if the corpus changed through other means than the invalidating
+    endpoints.
+    """
+    global _client
+    if _client is None:
+        _client = ServiceClient()
+    return _client
+
+
 def get_request(path=None, json=None):
     if path is None or json is None:
         raise ValueError(
             "get_request(): Both 'path' and 'json' cannot be None.")
-    try:
-        return requests_retry_session().get(path,
-                                            json=json,
-                                            timeout=REQUEST_TIMEOUT_SECONDS)
-    except requests.ConnectTimeout as ex:
-        raise Exception('{}: {}'.format(ex.__class__.__name__,
-                                        '408 Request Timeout'))
+    return get_client().get(path, json)
 
 
 def post_request(path=None, json=None):
     if path is None or json is None:
         raise ValueError(
             "post_request(): Both 'path' and 'json' cannot be None.")
-    try:
-        return requests_retry_session().post(path,
-                                             json=json,
-                                             timeout=REQUEST_TIMEOUT_SECONDS)
-    except requests.ConnectTimeout as ex:
-        raise Exception('{}: {}'.format(ex.__class__.__name__,
-                                        '408 Request Timeout'))
\ No newline at end of file
+    return get_client().post(path, json)
+
+
+async def async_get_request(path=None, json=None):
+    if path is None or json is None:
+        raise ValueError(
+            "async_get_request(): Both 'path' and 'json' cannot be None.")
+    return await get_client().aget(path, json)
+
+
+async def async_post_request(path=None, json=None):
+    if path is None or json is None:
+        raise ValueError(
+            "async_post_request(): Both 'path' and 'json' cannot be None.")
+    return await get_client().apost(path, json)
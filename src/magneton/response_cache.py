@@ -0,0 +1,276 @@
+from collections import OrderedDict
+from hashlib import sha256
+import json as jsonlib
+import os
+from pathlib import Path
+import pickle
+import re
+from threading import Lock
+import time
+from typing import Mapping, Optional, Sequence, TypedDict, Union
+from urllib.parse import urlsplit
+
+import requests
+from .constants import (CACHE_INVALIDATING_ENDPOINTS, CACHE_TTL_SECONDS,
+                        SERVICE_ENDPOINTS)
+
+# Matches the path of a URL to the name of its endpoint, e.g.
+# ".../granularity_distributions/paper" to "get_node_granularity_distribution"
+_ENDPOINT_PATTERNS = [
+    (name,
+     re.compile(
+         re.sub(r'\\\{\w+\\\}', '[^/]+', re.escape(template)) + '/?$'))
+    for name, template in SERVICE_ENDPOINTS.items()
+]
+
+
+def endpoint_of(url: str) -> Optional[str]:
+    """
+    Returns the name of the SERVICE_ENDPOINTS entry that url points to
+    """
+    path = urlsplit(url).path
+    for name, pattern in _ENDPOINT_PATTERNS:
+        if pattern.search(path):
+            return name
+    return None
+
+
+class ResponseCache:
+    """
+    Cache of service responses, keyed by method, URL and canonicalized JSON
+    body.
+
+    Responses are kept in memory, least recently used first out, within
+    max_entries and max_bytes. When disk_dir is set, they are also written
+    there (within max_disk_bytes), so that they survive kernel restarts.
+
+    Only successful responses of the endpoints in ttls are cached, each for
+    its number of seconds. A successful request to one of the invalidating
+    endpoints (which change the corpus) clears the whole cache. Changes
+    made to the corpus by other means are only seen once responses expire
+    (or after invalidate()).
+
+    Failing to write to disk_dir (e.g. a full disk) only skips the write.
+    The size of the files in disk_dir is scanned once, then tracked as they
+    are written and removed.
+    """
+
+    def __init__(self,
+                 max_entries=256,
+                 max_bytes=64 * 2**20,
+                 disk_dir: Union[str, Path, None] = None,
+                 max_disk_bytes=512 * 2**20,
+                 ttls: Mapping[str, float] = CACHE_TTL_SECONDS,
+                 invalidating: Sequence[str] = CACHE_INVALIDATING_ENDPOINTS):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir is not None else None
+        self.max_disk_bytes = max_disk_bytes
+        self.ttls = dict(ttls)
+        self.invalidating = set(invalidating)
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.__entries: 'OrderedDict[str, _Entry]' = OrderedDict()
+        self.__lock = Lock()
+        # Size of the files in disk_dir, least recently written first
+        self.__disk_sizes: 'OrderedDict[Path, int]' = OrderedDict()
+        self.__disk_bytes = 0
+        self.__scanned_dir: Optional[Path] = None
+
+    def get(self, method: str, url: str,
+            json=None) -> Optional[requests.Response]:
+        endpoint = endpoint_of(url)
+        if endpoint not in self.ttls:
+            return None
+
+        key = request_key(method, url, json)
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None:
+                self.__entries.move_to_end(key)
+            else:
+                entry = self.__read_disk(endpoint, key)
+                if entry is not None:
+                    self.__put(key, entry)
+
+            if entry is None or entry['expires'] < time.time():
+                if entry is not None:
+                    self.__remove(key)
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return _to_response(entry)
+
+    def update(self, method: str, url: str, json,
+               response: requests.Response):
+        """
+        Cache the response to a request, or invalidate the cache if the
+        request changed the corpus
+        """
+        if not response.ok:
+            return
+
+        endpoint = endpoint_of(url)
+        if endpoint in self.invalidating:
+            self.invalidate()
+            return
+
+        ttl = self.ttls.get(endpoint)
+        if ttl is None:
+            return
+
+        key = request_key(method, url, json)
+        entry = _Entry(endpoint=endpoint,
+                       expires=time.time() + ttl,
+                       url=response.url or url,
+                       status=response.status_code,
+                       headers=dict(response.headers),
+                       encoding=response.encoding,
+                       content=response.content)
+        with self.__lock:
+            self.__put(key, entry)
+            self.__write_disk(key, entry)
+
+    def invalidate(self, endpoint: str = None):
+        """
+        Remove the cached responses of an endpoint, or all of them
+        """
+        with self.__lock:
+            for key, entry in list(self.__entries.items()):
+                if endpoint is None or entry['endpoint'] == endpoint:
+                    self.__remove(key)
+
+            sizes = self.__disk_index()
+            for path in list(sizes):
+                if endpoint is None or path.name.startswith(endpoint + '-'):
+                    self.__remove_file(path)
+
+    def clear(self):
+        self.invalidate()
+        self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __put(self, key: str, entry: '_Entry'):
+        if key in self.__entries:
+            self.__remove(key)
+        self.__entries[key] = entry
+        self.nbytes += len(entry['content'])
+        while self.__entries and (len(self.__entries) > self.max_entries
+                                  or self.nbytes > self.max_bytes):
+            self.__remove(next(iter(self.__entries)))
+
+    def __remove(self, key: str):
+        entry = self.__entries.pop(key)
+        self.nbytes -= len(entry['content'])
+
+    def __disk_index(self) -> 'OrderedDict[Path, int]':
+        """
+        Size of the files in disk_dir, scanned when disk_dir is first used
+        """
+        if self.__scanned_dir != self.disk_dir:
+            self.__scanned_dir = self.disk_dir
+            self.__disk_sizes.clear()
+            self.__disk_bytes = 0
+            files = []
+            if self.disk_dir is not None:
+                try:
+                    files = [(p.stat(), p)
+                             for p in self.disk_dir.glob('*.pickle')]
+                except OSError:
+                    pass
+            for stat, path in sorted(files, key=lambda file: file[0].st_mtime):
+                self.__disk_sizes[path] = stat.st_size
+                self.__disk_bytes += stat.st_size
+        return self.__disk_sizes
+
+    def __remove_file(self, path: Path):
+        try:
+            path.unlink(missing_ok=True)
+        except OSError:
+            return
+        self.__disk_bytes -= self.__disk_sizes.pop(path, 0)
+
+    def __read_disk(self, endpoint: str, key: str) -> Optional['_Entry']:
+        if self.disk_dir is None:
+            return None
+        try:
+            with open(self.disk_dir / f'{endpoint}-{key}.pickle', 'rb') as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def __write_disk(self, key: str, entry: '_Entry'):
+        if self.disk_dir is None:
+            return
+
+        sizes = self.__disk_index()
+        path = self.disk_dir / f"{entry['endpoint']}-{key}.pickle"
+        tmp = path.with_suffix('.tmp')
+        try:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            with open(tmp, 'wb') as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+                size = f.tell()
+            os.replace(tmp, path)
+        except OSError:
+            # The response itself is fine, so it is only not kept on disk
+            try:
+                tmp.unlink(missing_ok=True)
+            except OSError:
+                pass
+            return
+
+        self.__disk_bytes += size - sizes.pop(path, 0)
+        sizes[path] = size
+
+        # Drop the least recently written files beyond the size bound
+        while sizes and self.__disk_bytes > self.max_disk_bytes:
+            self.__remove_file(next(iter(sizes)))
+
+
+def request_key(method: str, url: str, json) -> str:
+    body = jsonlib.dumps(json, sort_keys=True, separators=(',', ':'))
+    return sha256(f'{method.upper()} {url} {body}'.encode()).hexdigest()
+
+
+def copy_response(response: requests.Response) -> requests.Response:
+    """
+    Returns a copy of a response whose content was read, which callers can
+    change without affecting each other (see ServiceClient)
+    """
+    copy = requests.Response()
+    copy.status_code = response.status_code
+    copy.headers.update(response.headers)
+    copy.encoding = response.encoding
+    copy.url = response.url
+    copy.reason = response.reason
+    copy.elapsed = response.elapsed
+    copy.request = response.request
+    copy.history = list(response.history)
+    copy.cookies.update(response.cookies)
+    copy._content = response.content
+    return copy
+
+
+def _to_response(entry: '_Entry') -> requests.Response:
+    response = requests.Response()
+    response.status_code = entry['status']
+    response.headers.update(entry['headers'])
+    response.encoding = entry['encoding']
+    response.url = entry['url']
+    response._content = entry['content']
+    return response
+
+
+class _Entry(TypedDict):
+    endpoint: str
+    expires: float
+    url: str
+    status: int
+    headers: dict
+    encoding: Optional[str]
+    content: bytes
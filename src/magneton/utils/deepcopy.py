@@ -1,31 +1,230 @@
-from dataclasses import replace
-from typing import Any, Callable
+import copy
+from dataclasses import is_dataclass
+import sys
+from types import BuiltinFunctionType, FunctionType, MethodType
+from typing import Any, Callable, Dict, Mapping
 
+# Immutable types whose values are shared instead of copied
+_ATOMIC = frozenset(
+    {
+        type(None),
+        type(Ellipsis),
+        int,
+        float,
+        bool,
+        complex,
+        str,
+        bytes,
+        range,
+        type,
+        FunctionType,
+        BuiltinFunctionType,
+        MethodType,
+    }
+)
 
-def deepcopy(x, replacer: Callable[[Any], Any] = None):
-    if replacer:
-        x = replacer(x)
+Handler = Callable[[Any, Callable[[Any], Any]], Any]
 
-    # Sequence Types
-    if isinstance(x, list):
-        return list(deepcopy(y) for y in x)
-    if isinstance(x, tuple):
-        return tuple(deepcopy(y) for y in x)
+# Copy functions for specific types, see register_handler
+_handlers: Dict[type, Handler] = {}
 
-    # Mapping Types
-    if isinstance(x, dict):
-        return dict((deepcopy(k), deepcopy(v)) for k, v in x.items())
+_MISSING = object()
 
-    # Set Types
-    if isinstance(x, set):
-        return set(deepcopy(y) for y in x)
-    if isinstance(x, frozenset):
-        return frozenset(deepcopy(y) for y in x)
 
-    # Primitive Types
-    if isinstance(x, (str, int, float, complex, bool)):
-        return x
-    if x is None:
-        return x
+def register_handler(cls: type, handler: Handler):
+    """
+    Use handler(value, copy) to copy values of exactly the given type, where
+    copy(child) deep-copies a child value (sharing the same memo)
+    """
+    _handlers[cls] = handler
 
-    raise TypeError()
+
+def deepcopy(
+    x,
+    replacer: Callable[[Any], Any] = None,
+    memo: Dict[int, Any] = None,
+    handlers: Mapping[type, Handler] = None,
+):
+    """
+    Deep copy x without recursion.
+
+    - replacer is applied to every non-primitive value before it is copied,
+      e.g. to unwrap proxies.
+    - Shared and cyclic references are copied once, using a memo compatible
+      with copy.deepcopy.
+    - Immutable values (primitives, bytes, tuples/frozensets of primitives)
+      are shared with the original.
+    - NumPy arrays are copied as buffers; dataclasses and objects with
+      __slots__ are copied attribute by attribute; other types fall back to
+      copy.deepcopy.
+    """
+    if memo is None:
+        memo = {}
+    handlers = _handlers if handlers is None else {**_handlers, **handlers}
+
+    def copy_child(value):
+        return deepcopy(value, replacer, memo, handlers)
+
+    # Each stack item is (value, parent, key): the copy of value is stored in
+    # parent[key]. Immutable containers are built once their children are
+    # copied, via a (pending, None, None) finalizer pushed before them.
+    root = [None]
+    stack = [(x, root, 0)]
+    push, pop, atomic = stack.append, stack.pop, _ATOMIC
+    keep_alive = []
+    while stack:
+        value, parent, key = pop()
+
+        if parent is None:
+            children, constructor, parent, key, value_id = value
+            parent[key] = memo[value_id] = constructor(children)
+            continue
+
+        if replacer is not None and type(value) not in _ATOMIC:
+            replaced = replacer(value)
+            if replaced is not value:
+                keep_alive.append(value)
+                value = replaced
+
+        cls = type(value)
+        if cls in _ATOMIC:
+            parent[key] = value
+            continue
+
+        value_id = id(value)
+        copied = memo.get(value_id, _MISSING)
+        if copied is not _MISSING:
+            parent[key] = copied
+            continue
+
+        handler = handlers.get(cls) if handlers else None
+        if handler is not None:
+            parent[key] = memo[value_id] = handler(value, copy_child)
+
+        # Mapping Types
+        elif cls is dict or isinstance(value, dict):
+            new = parent[key] = memo[value_id] = {}
+            for k, v in value.items():
+                if type(k) not in atomic:
+                    k = copy_child(k)
+                new[k] = v
+                if type(v) not in atomic:
+                    push((v, new, k))
+
+        # Sequence Types
+        elif cls is list or isinstance(value, list):
+            new = parent[key] = memo[value_id] = list(value)
+            for i, v in enumerate(value):
+                if type(v) not in atomic:
+                    push((v, new, i))
+        elif isinstance(value, tuple):
+            mutable = [i for i, v in enumerate(value) if type(v) not in _ATOMIC]
+            if not mutable:
+                parent[key] = memo[value_id] = value
+            else:
+                children = list(value)
+                stack.append(((children, tuple, parent, key, value_id), None, None))
+                stack.extend((value[i], children, i) for i in mutable)
+
+        # Set Types
+        elif isinstance(value, set):
+            new = parent[key] = memo[value_id] = set()
+            for v in value:
+                new.add(v if type(v) in _ATOMIC else copy_child(v))
+        elif isinstance(value, frozenset):
+            if all(type(v) in _ATOMIC for v in value):
+                parent[key] = memo[value_id] = value
+            else:
+                parent[key] = memo[value_id] = frozenset(
+                    v if type(v) in _ATOMIC else copy_child(v) for v in value
+                )
+
+        # Binary Types
+        elif isinstance(value, bytearray):
+            parent[key] = memo[value_id] = bytearray(value)
+        elif _is_ndarray(value) and not value.dtype.hasobject:
+            parent[key] = memo[value_id] = value.copy()
+
+        # Plain objects
+        elif _copies_attributes(cls):
+            new = parent[key] = memo[value_id] = cls.__new__(cls)
+            if hasattr(value, "__dict__"):
+                attrs = new.__dict__
+                for k, v in value.__dict__.items():
+                    attrs[k] = v
+                    if type(v) not in _ATOMIC:
+                        stack.append((v, attrs, k))
+            slots = _Slots(new)
+            for name in _slot_names(cls):
+                if hasattr(value, name):
+                    v = getattr(value, name)
+                    slots[name] = v
+                    if type(v) not in _ATOMIC:
+                        stack.append((v, slots, name))
+
+        else:
+            parent[key] = copy.deepcopy(value, memo)
+
+    return root[0]
+
+
+def _is_ndarray(value):
+    numpy = sys.modules.get("numpy")
+    return numpy is not None and isinstance(value, numpy.ndarray)
+
+
+class _Slots:
+    """
+    Assigns slot attributes through item assignment, bypassing any custom or
+    frozen __setattr__
+    """
+
+    __slots__ = ("obj",)
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __setitem__(self, name, value):
+        object.__setattr__(self.obj, name, value)
+
+
+_slot_names_cache: Dict[type, tuple] = {}
+
+
+def _slot_names(cls: type) -> tuple:
+    names = _slot_names_cache.get(cls)
+    if names is None:
+        names = []
+        for base in cls.__mro__:
+            slots = base.__dict__.get("__slots__", ())
+            if isinstance(slots, str):
+                slots = (slots,)
+            for name in slots:
+                if name in ("__dict__", "__weakref__"):
+                    continue
+                if name.startswith("__") and not name.endswith("__"):
+                    name = f"_{base.__name__.lstrip('_')}{name}"
+                names.append(name)
+        names = _slot_names_cache[cls] = tuple(names)
+    return names
+
+
+_copies_attributes_cache: Dict[type, bool] = {}
+
+
+def _copies_attributes(cls: type) -> bool:
+    """
+    Whether instances of cls can be copied attribute by attribute, i.e. they
+    are dataclasses or __slots__ objects without custom copy/pickle hooks
+    """
+    result = _copies_attributes_cache.get(cls)
+    if result is None:
+        result = _copies_attributes_cache[cls] = not hasattr(cls, "__deepcopy__") and (
+            is_dataclass(cls)
+            or (
+                any("__slots__" in base.__dict__ for base in cls.__mro__[:-1])
+                and cls.__reduce_ex__ is object.__reduce_ex__
+                and cls.__reduce__ is object.__reduce__
+            )
+        )
+    return result
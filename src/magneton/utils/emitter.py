@@ -1,20 +1,92 @@
 from collections import defaultdict
-from typing import Callable, TypeVar, Generic
+from types import MethodType
+from typing import Callable, Optional, TypeVar, Generic
+from weakref import WeakMethod, ref
 
 
 Event = TypeVar("Event", bound=str)
 
 
+class Subscription:
+    """
+    Handle of a registered listener. dispose() (or leaving a `with` block)
+    removes the listener; disposing more than once is harmless.
+    """
+
+    __slots__ = ("__dispose",)
+
+    def __init__(self, dispose: Callable[[], None]):
+        self.__dispose = dispose
+
+    @property
+    def disposed(self) -> bool:
+        return self.__dispose is None
+
+    def dispose(self):
+        dispose, self.__dispose = self.__dispose, None
+        if dispose is not None:
+            dispose()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.dispose()
+
+
+def weak_callable(listener: Callable, on_dead: Optional[Callable[[], None]] = None):
+    """
+    Returns a function that calls listener without keeping it (or, for bound
+    methods, its object) alive. on_dead is called once listener is collected.
+    """
+    callback = None if on_dead is None else (lambda _: on_dead())
+    if isinstance(listener, MethodType):
+        listener_ref = WeakMethod(listener, callback)
+    else:
+        listener_ref = ref(listener, callback)
+
+    def call(*args, **kwargs):
+        listener = listener_ref()
+        if listener is not None:
+            return listener(*args, **kwargs)
+
+    return call
+
+
+def _listener_key(listener: Callable):
+    # Bound methods are created on every attribute access, so identify them
+    # by their object and function
+    if isinstance(listener, MethodType):
+        return (id(listener.__self__), id(listener.__func__))
+    return id(listener)
+
+
 class Emitter(Generic[Event]):
     def __init__(self) -> None:
-        self.__listeners = defaultdict(set)
+        self.__listeners = defaultdict(dict)
+
+    def on(self, event: Event, listener: Callable, weak=False) -> Subscription:
+        """
+        Call listener on every event. Weak listeners are removed once they
+        (or the object of a bound method) are garbage collected.
+        """
+        listeners = self.__listeners[event]
+        key = _listener_key(listener)
 
-    def on(self, event: Event, listener: Callable):
-        self.__listeners[event].add(listener)
+        def remove():
+            if listeners.get(key) is call:
+                del listeners[key]
+
+        call = weak_callable(listener, remove) if weak else listener
+        listeners[key] = call
+        return Subscription(remove)
 
     def off(self, event: Event, listener: Callable):
-        self.__listeners[event].remove(listener)
+        del self.__listeners[event][_listener_key(listener)]
 
     def emit(self, event: Event, *args, **kwargs):
-        for listener in frozenset(self.__listeners[event]):
+        for listener in list(self.__listeners[event].values()):
             listener(*args, **kwargs)
+
+    def listener_count(self, event: Event) -> int:
+        return len(self.__listeners[event])
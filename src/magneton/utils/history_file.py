@@ -0,0 +1,499 @@
+"""
+Compact on-disk storage of widget history (see
+StatefulWidgetBase.save_history and load_history).
+
+A history file is made of two files:
+- the data file (path), holding two zlib-compressed pickles per entry: its
+  metadata (the entry without its state), then its state, which is the whole
+  state for keyframes (one every keyframe_interval records) and otherwise
+  only the changes from the previous record's state;
+- the index file (path + ".idx"), holding one fixed-size record per entry
+  with its offset, lengths, flags, push number and size in memory.
+
+Both files start with the same random id, so that an index is never read
+against another data file.
+
+Entries are appended to both files, and only the index is read when a file
+is opened: metadata and states are decoded when accessed, states from the
+nearest keyframe (or cached entry) before them. Decoded states share
+unchanged subtrees, like the snapshots of a live history. Deleted entries
+are only marked as removed, since later records may be based on them, until
+they make up COMPACT_RATIO of the records and the files are rewritten
+without them.
+
+History files are pickles, so only open files you trust.
+"""
+
+from collections import OrderedDict
+from collections.abc import MutableSequence
+import os
+import pickle
+import struct
+from typing import Any, Dict, List, Literal, Optional, Tuple
+import zlib
+
+from .snapshot import diff
+
+MAGIC = b"MAGHIST2"
+
+# Fraction of removed records above which the files are compacted
+COMPACT_RATIO = 0.5
+
+# Header of the data file: magic and file id
+_DATA_HEADER = struct.Struct("<8s8s")
+
+# Header of the index file: magic, file id and keyframe interval
+_HEADER = struct.Struct("<8s8sI")
+
+# Index record: offset in the data file, lengths of the metadata and the
+# state, flags, push number and size in memory
+_RECORD = struct.Struct("<QIIBIQ")
+_FLAGS_OFFSET = 16
+
+_KEYFRAME = 1
+_REMOVED = 2
+
+
+class _Deleted:
+    """
+    Value of a change that removes the value at its path
+    """
+
+    def __reduce__(self):
+        # Unpickle as the same instance
+        return "_DELETED"
+
+
+_DELETED = _Deleted()
+
+
+class HistoryFile(MutableSequence):
+    """
+    History entries ({..., "state": snapshot}) stored in a file at path.
+    Entries can be appended, deleted and read like a list, but not replaced
+    or inserted elsewhere than at the end.
+
+    As with open(), mode "r" opens an existing file, "x" creates a new one
+    and "a" does either. Entries can be appended in every mode.
+    """
+
+    def __init__(
+        self,
+        path,
+        mode: Literal["r", "x", "a"] = "a",
+        keyframe_interval: int = 128,
+        cache_size: int = 64,
+    ):
+        self.path = os.fspath(path)
+        self.cache_size = cache_size
+        # Decoded (metadata, state) of recently accessed records
+        self.__cache: "OrderedDict[int, Tuple[Dict, Any]]" = OrderedDict()
+
+        if mode == "a":
+            mode = "r" if os.path.exists(self.path) else "x"
+        if mode == "r":
+            self.__open()
+        elif mode == "x":
+            self.__create(keyframe_interval)
+        else:
+            raise ValueError(f"invalid mode: {mode!r}")
+
+    def __reset(self):
+        # Physical records, including those removed from the history (which
+        # later records may still be based on)
+        self.__offsets: List[int] = []
+        self.__meta_lengths: List[int] = []
+        self.__lengths: List[int] = []
+        self.__flags: List[int] = []
+        self.__seqs: List[int] = []
+        self.__sizes: List[int] = []
+        self.__decoded_metadata: List[Optional[Dict]] = []
+        # Physical record of each entry of the history
+        self.__live: List[int] = []
+
+    def __create(self, keyframe_interval: int):
+        self.__reset()
+        self.keyframe_interval = keyframe_interval
+        file_id = os.urandom(8)
+
+        self.__data = open(self.path, "x+b")
+        try:
+            self.__index = open(self.path + ".idx", "x+b")
+        except BaseException:
+            self.__data.close()
+            os.remove(self.path)
+            raise
+
+        self.__data.write(_DATA_HEADER.pack(MAGIC, file_id))
+        self.__index.write(_HEADER.pack(MAGIC, file_id, keyframe_interval))
+        self.flush()
+
+    def __open(self):
+        self.__reset()
+        self.__data = open(self.path, "r+b")
+        try:
+            header = self.__data.read(_DATA_HEADER.size)
+            if len(header) < _DATA_HEADER.size or header[: len(MAGIC)] != MAGIC:
+                raise ValueError(f"{self.path} is not a history file")
+            self.__index = open(self.path + ".idx", "r+b")
+        except BaseException:
+            self.__data.close()
+            raise
+
+        try:
+            self.__read_index(_DATA_HEADER.unpack(header)[1])
+        except BaseException:
+            self.close()
+            raise
+
+    def __read_index(self, file_id: bytes):
+        data_size = self.__data.seek(0, os.SEEK_END)
+
+        content = self.__index.read()
+        if len(content) < _HEADER.size:
+            raise ValueError(f"{self.path}.idx is not a history index")
+        magic, index_id, self.keyframe_interval = _HEADER.unpack_from(content)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path}.idx is not a history index")
+        if index_id != file_id:
+            raise ValueError(f"{self.path}.idx is the index of another file")
+
+        # Ignore a partly written last record, e.g. after a crash
+        end = _HEADER.size
+        end += (len(content) - end) // _RECORD.size * _RECORD.size
+        for offset, meta_length, length, flags, seq, size in _RECORD.iter_unpack(
+            content[_HEADER.size : end]
+        ):
+            if offset + meta_length + length > data_size:
+                break
+            if not flags & _REMOVED:
+                self.__live.append(len(self.__offsets))
+            self.__offsets.append(offset)
+            self.__meta_lengths.append(meta_length)
+            self.__lengths.append(length)
+            self.__flags.append(flags)
+            self.__seqs.append(seq)
+            self.__sizes.append(size)
+            self.__decoded_metadata.append(None)
+
+    def __len__(self):
+        return len(self.__live)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+
+        metadata, state = self.__decode(self.__live[i])
+        return {**metadata, "state": state}
+
+    def __iter__(self):
+        for p in list(self.__live):
+            metadata, state = self.__decode(p)
+            yield {**metadata, "state": state}
+
+    def __setitem__(self, i, entry):
+        raise TypeError("history entries cannot be replaced")
+
+    def insert(self, i, entry):
+        if i != len(self):
+            raise ValueError("history entries can only be appended")
+        self.append(entry)
+
+    def append(self, entry, seq: Optional[int] = None, nbytes: int = 0):
+        """
+        Append an entry, with its push number (see set_history_budget) and
+        size in memory
+        """
+        p = len(self.__offsets)
+        metadata = {key: value for key, value in entry.items() if key != "state"}
+        state = entry["state"]
+
+        if p % self.keyframe_interval == 0:
+            flags, payload = _KEYFRAME, state
+        else:
+            _, previous = self.__decode(p - 1)
+            flags, payload = 0, _changes(previous, state)
+
+        meta_data = _encode(metadata)
+        data = _encode(payload)
+        offset = self.__data.seek(0, os.SEEK_END)
+        self.__data.write(meta_data + data)
+
+        seq = len(self.__live) if seq is None else seq
+        self.__index.seek(0, os.SEEK_END)
+        self.__index.write(
+            _RECORD.pack(offset, len(meta_data), len(data), flags, seq, nbytes)
+        )
+        self.flush()
+
+        self.__offsets.append(offset)
+        self.__meta_lengths.append(len(meta_data))
+        self.__lengths.append(len(data))
+        self.__flags.append(flags)
+        self.__seqs.append(seq)
+        self.__sizes.append(nbytes)
+        self.__decoded_metadata.append(metadata)
+        self.__live.append(p)
+        self.__remember(p, (metadata, state))
+
+    def __delitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(len(self))
+            if stop >= len(self) and step == 1:
+                self.__truncate(start)
+            else:
+                for j in sorted(range(start, stop, step), reverse=True):
+                    del self[j]
+            return
+
+        p = self.__live.pop(i)
+        self.__flags[p] |= _REMOVED
+        self.__index.seek(_HEADER.size + p * _RECORD.size + _FLAGS_OFFSET)
+        self.__index.write(bytes([self.__flags[p]]))
+        self.flush()
+
+        removed = len(self.__offsets) - len(self.__live)
+        if removed >= self.keyframe_interval and removed >= COMPACT_RATIO * len(
+            self.__offsets
+        ):
+            self.compact()
+
+    def __truncate(self, start: int):
+        """
+        Remove the entries from start on. No entry before start is based on
+        them, so their records are removed from the files.
+        """
+        if start >= len(self):
+            return
+
+        p = self.__live[start]
+        del self.__live[start:]
+        self.__data.truncate(self.__offsets[p])
+        self.__index.truncate(_HEADER.size + p * _RECORD.size)
+        self.flush()
+
+        for records in (
+            self.__offsets,
+            self.__meta_lengths,
+            self.__lengths,
+            self.__flags,
+            self.__seqs,
+            self.__sizes,
+            self.__decoded_metadata,
+        ):
+            del records[p:]
+        for q in [q for q in self.__cache if q >= p]:
+            del self.__cache[q]
+
+    def compact(self):
+        """
+        Rewrite the files without the records of removed entries
+        """
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        for path in (temp_path, temp_path + ".idx"):
+            if os.path.exists(path):
+                os.remove(path)
+
+        # Keep the decoded entries, so that new decodes share their structure
+        positions = {p: q for q, p in enumerate(self.__live)}
+        cache = [
+            (positions[p], decoded)
+            for p, decoded in self.__cache.items()
+            if p in positions
+        ]
+
+        with HistoryFile(
+            temp_path, "x", self.keyframe_interval, self.cache_size
+        ) as compacted:
+            for p in self.__live:
+                metadata, state = self.__decode(p)
+                compacted.append(
+                    {**metadata, "state": state},
+                    seq=self.__seqs[p],
+                    nbytes=self.__sizes[p],
+                )
+
+        # The index is replaced last: until then, the old index does not
+        # match the new data file and opening them fails
+        self.close()
+        os.replace(temp_path, self.path)
+        os.replace(temp_path + ".idx", self.path + ".idx")
+        self.__open()
+        for q, decoded in cache:
+            self.__remember(q, decoded)
+
+    def metadata(self, i: int) -> Dict:
+        """
+        Entry i without its state, which is not decoded
+        """
+        return self.__get_metadata(self.__live[i])
+
+    @property
+    def seqs(self) -> List[int]:
+        """
+        Push number of each entry
+        """
+        return [self.__seqs[p] for p in self.__live]
+
+    @property
+    def sizes(self) -> List[int]:
+        """
+        Size in memory of each entry when it was appended
+        """
+        return [self.__sizes[p] for p in self.__live]
+
+    def __decode(self, p: int):
+        cached = self.__cache.get(p)
+        if cached is not None:
+            self.__cache.move_to_end(p)
+            return cached
+
+        # Start from the nearest cached record or keyframe before p
+        start = p
+        while start not in self.__cache and not self.__flags[start] & _KEYFRAME:
+            start -= 1
+
+        if start in self.__cache:
+            _, state = self.__cache[start]
+        else:
+            state = self.__load(start)
+            if self.__cache:
+                # Share structure with the nearest decoded record, so that
+                # comparing decoded states stays cheap (see snapshot.diff)
+                nearest = min(self.__cache, key=lambda q: abs(q - start))
+                state = _share(state, self.__cache[nearest][1])
+            self.__remember(start, (self.__get_metadata(start), state))
+
+        for q in range(start + 1, p + 1):
+            state = _apply(state, self.__load(q))
+            self.__remember(q, (self.__get_metadata(q), state))
+        return self.__cache[p]
+
+    def __get_metadata(self, p: int) -> Dict:
+        metadata = self.__decoded_metadata[p]
+        if metadata is None:
+            self.__data.seek(self.__offsets[p])
+            metadata = _decode(self.__data.read(self.__meta_lengths[p]))
+            self.__decoded_metadata[p] = metadata
+        return metadata
+
+    def __load(self, p: int):
+        """
+        State or changes of record p
+        """
+        self.__data.seek(self.__offsets[p] + self.__meta_lengths[p])
+        return _decode(self.__data.read(self.__lengths[p]))
+
+    def __remember(self, p: int, decoded):
+        self.__cache[p] = decoded
+        self.__cache.move_to_end(p)
+        while len(self.__cache) > self.cache_size:
+            self.__cache.popitem(last=False)
+
+    def flush(self):
+        self.__data.flush()
+        self.__index.flush()
+
+    def close(self):
+        self.__data.close()
+        self.__index.close()
+        self.__cache.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _encode(value) -> bytes:
+    return zlib.compress(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+
+def _decode(data: bytes):
+    return pickle.loads(zlib.decompress(data))
+
+
+def _get(value, path):
+    for key in path:
+        value = value[key]
+    return value
+
+
+def _contains(value, path):
+    for key in path:
+        if isinstance(value, dict):
+            if key not in value:
+                return False
+        elif not (isinstance(value, list) and 0 <= key < len(value)):
+            return False
+        value = value[key]
+    return True
+
+
+def _changes(previous, state):
+    """
+    Returns the changes that turn the previous state into state, as
+    (path, value) pairs
+    """
+    return [
+        (path, _get(state, path) if _contains(state, path) else _DELETED)
+        for path in diff(previous, state)
+    ]
+
+
+def _share(value, other):
+    """
+    Returns value with its subtrees that are equal to those of other replaced
+    by them. Only containers of value are modified.
+    """
+    if value is other:
+        return value
+    try:
+        if type(value) == type(other) and value == other:
+            return other
+    except (TypeError, ValueError):
+        # e.g. arrays, whose comparison is not a bool
+        pass
+
+    if isinstance(value, dict) and isinstance(other, dict):
+        for key, child in value.items():
+            if key in other:
+                value[key] = _share(child, other[key])
+    elif isinstance(value, list) and isinstance(other, list):
+        for i in range(min(len(value), len(other))):
+            value[i] = _share(value[i], other[i])
+    return value
+
+
+def _apply(state, changes):
+    """
+    Returns a copy of state with the changes applied, sharing every subtree
+    they do not touch
+    """
+    # Containers copied so far, by id
+    copies = {}
+
+    def copy(value):
+        value = dict(value) if isinstance(value, dict) else list(value)
+        copies[id(value)] = value
+        return value
+
+    for path, value in changes:
+        if len(path) == 0:
+            state = value
+            continue
+
+        if id(state) not in copies:
+            state = copy(state)
+        node = state
+        for key in path[:-1]:
+            if id(node[key]) not in copies:
+                node[key] = copy(node[key])
+            node = node[key]
+
+        if value is _DELETED:
+            del node[path[-1]]
+        else:
+            node[path[-1]] = value
+    return state
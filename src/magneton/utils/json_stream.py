@@ -0,0 +1,62 @@
+import codecs
+import json
+from typing import Iterable, Iterator
+
+_WHITESPACE = " \t\n\r"
+
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator:
+    """
+    Yield the items of a JSON array as the chunks of its UTF-8 encoding
+    arrive, without holding the whole document in memory. If the document is
+    not an array, it is parsed at the end and yielded as a single item.
+    """
+    decode = codecs.getincrementaldecoder("utf-8")().decode
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    state = "start"
+
+    for chunk in chunks:
+        buffer = buffer[pos:] + decode(chunk)
+        pos = 0
+        if state == "document":
+            continue
+
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos == len(buffer):
+                break
+
+            if state == "start":
+                if buffer[pos] != "[":
+                    state = "document"
+                    break
+                pos += 1
+                state = "first"
+            elif state in ("first", "item"):
+                if state == "first" and buffer[pos] == "]":
+                    return
+                try:
+                    item, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    break  # Wait for the rest of the item
+                if end == len(buffer):
+                    break  # Numbers might continue in the next chunk
+                yield item
+                pos = end
+                state = "separator"
+            else:
+                if buffer[pos] == "]":
+                    return
+                if buffer[pos] != ",":
+                    raise ValueError(f"Unexpected {buffer[pos]!r} in JSON array")
+                pos += 1
+                state = "item"
+
+    buffer = buffer[pos:] + decode(b"", final=True)
+    if state == "document":
+        yield json.loads(buffer)
+    elif state != "start" or buffer.strip():
+        raise ValueError("Truncated JSON array")
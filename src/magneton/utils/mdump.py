@@ -1,10 +1,12 @@
 import json
 from math import inf
 from ..core.widget import WidgetModel
-from colorama import Fore, Style
 
 
 def mdump(model, depth=inf, indent_level=0):
+    # Imported here so that colorama is only loaded when printing
+    from colorama import Fore, Style
+
     data = WidgetModel.unproxy(model)
     pre = "  " * indent_level
 
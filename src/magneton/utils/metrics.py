@@ -0,0 +1,235 @@
+"""
+Metrics of widgets: render, export, message, model, action, history and
+HTTP timings and sizes.
+
+Metrics are only measured while at least one sink is registered (see
+add_sink() and profile()); otherwise instrumented code only checks ENABLED.
+Each measurement has a name, a value and labels, e.g.
+("render.seconds", 0.002, {"widget": "HistoryView", "component": "..."}).
+
+Names:
+- render.seconds: time spent rendering a component in Python
+- render.latency: time from a render request to the frame that renders it
+- export.seconds, export.patches: model props sent on render
+- export.bytes: size of the JSON of the model values sent on render (the
+  snapshot, or the values of the patches as measured when they were recorded)
+- messages.pending: messages in a widget's log, on each send and ack
+- messages.unacked: messages sent after the last one a component
+  acknowledged, on each ack (a count of messages, not a time)
+- model.fanout: observers and watchers called per model notification, by
+  widget
+- action.fetch_seconds: time an action spent awaiting service requests
+  (while any is in flight, so concurrent requests count once)
+- action.compute_seconds: rest of the time spent running an action
+- action.flush_seconds: time spent rendering and pushing history after it
+- history.bytes, history.entries: memory and size of a widget's history
+- http.seconds: duration of service requests, by endpoint
+"""
+
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+import logging
+from threading import Lock
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, Protocol, Tuple
+
+from .emitter import Subscription
+
+# Whether any sink is registered. Instrumented code checks this first, so
+# that disabled metrics cost a single attribute lookup.
+ENABLED = False
+
+_sinks: List["Sink"] = []
+
+# Time spent awaiting service requests by the current action
+_fetch_time: ContextVar[Optional["FetchTime"]] = ContextVar("fetch_time", default=None)
+
+
+class Sink(Protocol):
+    def record(self, name: str, value: float, labels: Dict[str, str]): ...
+
+
+def add_sink(sink: Sink) -> Subscription:
+    global ENABLED
+    _sinks.append(sink)
+    ENABLED = True
+    return Subscription(lambda: remove_sink(sink))
+
+
+def remove_sink(sink: Sink):
+    global ENABLED
+    if sink in _sinks:
+        _sinks.remove(sink)
+    ENABLED = bool(_sinks)
+
+
+def record(name: str, value: float, **labels):
+    for sink in list(_sinks):
+        sink.record(name, value, labels)
+
+
+@contextmanager
+def timer(name: str, **labels):
+    """
+    Record the time spent in the block as name
+    """
+    if not ENABLED:
+        yield
+        return
+
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        record(name, perf_counter() - start, **labels)
+
+
+class FetchTime:
+    """
+    Time during which at least one service request was in flight, i.e. the
+    union of the intervals of the requests, so that concurrent requests
+    (e.g. ServiceClient.batch) are only counted once
+    """
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.__active = 0
+        self.__since = 0.0
+        self.__lock = Lock()
+
+    def start(self):
+        with self.__lock:
+            if self.__active == 0:
+                self.__since = perf_counter()
+            self.__active += 1
+
+    def stop(self):
+        with self.__lock:
+            self.__active -= 1
+            if self.__active == 0:
+                self.seconds += perf_counter() - self.__since
+
+
+@contextmanager
+def collect_fetch_time():
+    """
+    Collect the time spent awaiting service requests inside the block (in
+    this task and the tasks it starts) into the yielded FetchTime
+    """
+    fetch_time = FetchTime()
+    token = _fetch_time.set(fetch_time)
+    try:
+        yield fetch_time
+    finally:
+        _fetch_time.reset(token)
+
+
+@contextmanager
+def fetching():
+    """
+    Count the block as time spent awaiting a service request, if fetch time
+    is being collected (see collect_fetch_time())
+    """
+    fetch_time = _fetch_time.get()
+    if fetch_time is None:
+        yield
+        return
+
+    fetch_time.start()
+    try:
+        yield
+    finally:
+        fetch_time.stop()
+
+
+@contextmanager
+def profile():
+    """
+    Collect metrics in a SummarySink for the duration of the block, e.g.
+
+        with metrics.profile() as summary:
+            ...
+        print(summary.table())
+    """
+    sink = SummarySink()
+    subscription = add_sink(sink)
+    try:
+        yield sink
+    finally:
+        subscription.dispose()
+
+
+class SummarySink:
+    """
+    Keeps count, total, min, max and last value of each metric and labels
+    """
+
+    def __init__(self):
+        self.__stats: Dict[Tuple, Dict[str, float]] = defaultdict(
+            lambda: {"count": 0, "total": 0.0, "min": float("inf"), "max": 0.0}
+        )
+
+    def record(self, name: str, value: float, labels: Dict[str, str]):
+        stats = self.__stats[(name, tuple(sorted(labels.items())))]
+        stats["count"] += 1
+        stats["total"] += value
+        stats["min"] = min(stats["min"], value)
+        stats["max"] = max(stats["max"], value)
+        stats["last"] = value
+
+    def summary(self, **labels) -> List[Dict]:
+        """
+        Returns the statistics of every metric whose labels include the
+        given ones, e.g. summary(widget="HistoryView")
+        """
+        rows = []
+        for (name, metric_labels), stats in self.__stats.items():
+            metric_labels = dict(metric_labels)
+            if all(metric_labels.get(k) == v for k, v in labels.items()):
+                rows.append(
+                    {
+                        "name": name,
+                        "labels": metric_labels,
+                        **stats,
+                        "mean": stats["total"] / stats["count"],
+                    }
+                )
+        return sorted(rows, key=lambda row: row["name"])
+
+    def table(self, **labels) -> str:
+        lines = [f"{'metric':<28}{'count':>8}{'mean':>12}{'max':>12}  labels"]
+        for row in self.summary(**labels):
+            lines.append(
+                f"{row['name']:<28}{row['count']:>8}{row['mean']:>12.4g}"
+                f"{row['max']:>12.4g}  {row['labels']}"
+            )
+        return "\n".join(lines)
+
+    def reset(self):
+        self.__stats.clear()
+
+
+class LoggingSink:
+    """
+    Logs every measurement
+    """
+
+    def __init__(self, logger: logging.Logger = None, level=logging.DEBUG):
+        self.logger = logger or logging.getLogger("magneton.metrics")
+        self.level = level
+
+    def record(self, name: str, value: float, labels: Dict[str, str]):
+        self.logger.log(self.level, "%s=%g %s", name, value, labels)
+
+
+class CallbackSink:
+    """
+    Calls callback(name, value, labels) for every measurement
+    """
+
+    def __init__(self, callback: Callable[[str, float, Dict[str, str]], None]):
+        self.callback = callback
+
+    def record(self, name: str, value: float, labels: Dict[str, str]):
+        self.callback(name, value, labels)
@@ -0,0 +1,82 @@
+from asyncio import Task, ensure_future, get_running_loop, shield
+from concurrent.futures import Future
+from threading import Lock
+from typing import Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: while a call is in flight,
+    later calls with its key wait for it and share its result (or exception)
+    instead of running again. hits counts the calls that shared a result,
+    misses the calls that actually ran.
+
+    Synchronous calls (do) are only shared with synchronous calls from other
+    threads, and async calls (ado) with async calls on the same event loop.
+
+    When results are mutable, give a copy function: every caller, including
+    the one that ran the call, then gets its own copy(result).
+    """
+
+    def __init__(self, copy: Optional[Callable[[T], T]] = None):
+        self.copy = copy
+        self.hits = 0
+        self.misses = 0
+        self.__lock = Lock()
+        self.__calls: Dict[Hashable, Future] = {}
+        self.__tasks: Dict[Hashable, Task] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """
+        Returns fn(), or the result of the call with the same key that is
+        already running in another thread
+        """
+        with self.__lock:
+            future = self.__calls.get(key)
+            leader = future is None
+            if leader:
+                future = self.__calls[key] = Future()
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if not leader:
+            return self.__share(future.result())
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return self.__share(result)
+        finally:
+            with self.__lock:
+                del self.__calls[key]
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Returns await fn(), or the result of the call with the same key that
+        is already running on this event loop. Cancelling one of the callers
+        does not cancel the shared call.
+        """
+        task = self.__tasks.get(key)
+        if task is None or task.get_loop() is not get_running_loop():
+            with self.__lock:
+                self.misses += 1
+            task = self.__tasks[key] = ensure_future(fn())
+            task.add_done_callback(lambda _: self.__forget(key, task))
+        else:
+            with self.__lock:
+                self.hits += 1
+        return self.__share(await shield(task))
+
+    def __share(self, result: T) -> T:
+        return result if self.copy is None else self.copy(result)
+
+    def __forget(self, key: Hashable, task: Task):
+        if self.__tasks.get(key) is task:
+            del self.__tasks[key]
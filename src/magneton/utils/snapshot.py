@@ -0,0 +1,208 @@
+from sys import getsizeof
+from typing import Iterator, Sequence, Tuple, Union
+from .deepcopy import deepcopy
+
+# WidgetModel is imported where it is used, since importing it loads the
+# widget package, whose modules import this one
+
+Path = Tuple[Union[str, int], ...]
+
+# Marks a subtree of a PathSet as entirely dirty
+WHOLE = True
+
+_PRIMITIVES = (str, int, float, bool, complex, bytes, type(None))
+
+
+class PathSet:
+    """
+    Set of paths stored as a trie, where adding a path also covers all of its
+    descendants
+    """
+
+    def __init__(self, paths: Sequence[Path] = ()):
+        self.root = {}
+        for path in paths:
+            self.add(path)
+
+    def add(self, path: Path):
+        if self.root is WHOLE:
+            return
+        if len(path) == 0:
+            self.root = WHOLE
+            return
+
+        node = self.root
+        for key in path[:-1]:
+            child = node.setdefault(key, {})
+            if child is WHOLE:
+                return
+            node = child
+        node[path[-1]] = WHOLE
+
+    def clear(self):
+        self.root = {}
+
+    def __bool__(self):
+        return self.root is WHOLE or len(self.root) > 0
+
+
+def freeze(value):
+    """
+    Copy a (possibly proxied) value into a snapshot. Snapshots are never
+    mutated, so they can safely share structure with each other.
+    """
+    from ..core.widget.widget_model import WidgetModel
+
+    return deepcopy(value, replacer=WidgetModel.unproxy)
+
+
+def thaw(value):
+    """
+    Copy a snapshot value so that it can be placed back into a live model
+    """
+    return deepcopy(value)
+
+
+def _same_shape(a, b):
+    if isinstance(a, dict) and isinstance(b, dict):
+        return True
+    return isinstance(a, list) and isinstance(b, list) and len(a) == len(b)
+
+
+def _contains(container, key):
+    if isinstance(container, dict):
+        return key in container
+    return isinstance(key, int) and 0 <= key < len(container)
+
+
+def snapshot(live, base=None, dirty: PathSet = None):
+    """
+    Create a snapshot of the live value. If a base snapshot and the paths
+    changed since it was taken are given, only the changed paths are copied
+    and every other subtree is shared with the base.
+    """
+    from ..core.widget.widget_model import WidgetModel
+
+    if base is None or dirty is None:
+        return freeze(live)
+    return _snapshot(WidgetModel.unproxy(live), base, dirty.root)
+
+
+def _snapshot(live, base, node):
+    from ..core.widget.widget_model import WidgetModel
+
+    live = WidgetModel.unproxy(live)
+    if node is WHOLE or not _same_shape(live, base):
+        return freeze(live)
+
+    copy = dict(base) if isinstance(base, dict) else list(base)
+    for key, child in node.items():
+        if _contains(live, key):
+            if _contains(base, key):
+                copy[key] = _snapshot(live[key], base[key], child)
+            else:
+                copy[key] = freeze(live[key])
+        elif isinstance(copy, dict):
+            copy.pop(key, None)
+    return copy
+
+
+def diff(a, b, path: Path = ()) -> Iterator[Path]:
+    """
+    Yield the paths at which two snapshots differ. Subtrees shared between
+    the snapshots are skipped, so the cost is proportional to the difference.
+    """
+    if a is b:
+        return
+
+    if isinstance(a, dict) and isinstance(b, dict):
+        for key, value in a.items():
+            if key not in b:
+                yield path + (key,)
+            else:
+                yield from diff(value, b[key], path + (key,))
+        for key in b:
+            if key not in a:
+                yield path + (key,)
+    elif _same_shape(a, b):
+        for i, (x, y) in enumerate(zip(a, b)):
+            yield from diff(x, y, path + (i,))
+    elif type(a) != type(b) or type(a) not in _PRIMITIVES or a != b:
+        # Other leaves (e.g. arrays) are only shared when unchanged
+        yield path
+
+
+def nbytes(value, *shared) -> int:
+    """
+    Approximate number of bytes used by a snapshot, excluding subtrees it
+    shares with (i.e. are identical to the same path in) the given snapshots
+    """
+    total = 0
+    seen = set()
+    stack = [(value, shared)]
+    while stack:
+        x, others = stack.pop()
+        if id(x) in seen or any(x is other for other in others):
+            continue
+
+        seen.add(id(x))
+        total += getsizeof(x)
+        if isinstance(x, dict):
+            for key, child in x.items():
+                stack.append(
+                    (
+                        child,
+                        tuple(
+                            o[key] for o in others if isinstance(o, dict) and key in o
+                        ),
+                    )
+                )
+        elif isinstance(x, (list, tuple)):
+            for i, child in enumerate(x):
+                stack.append(
+                    (
+                        child,
+                        tuple(
+                            o[i]
+                            for o in others
+                            if isinstance(o, (list, tuple)) and i < len(o)
+                        ),
+                    )
+                )
+        elif isinstance(x, (set, frozenset)):
+            stack.extend((child, ()) for child in x)
+
+    return total
+
+
+def restore(live: "WidgetModel", target, paths: PathSet):
+    """
+    Make the live (proxied) value equal to the target snapshot by assigning
+    only the given paths. Returns False if the whole value must be replaced
+    instead.
+    """
+    from ..core.widget.widget_model import WidgetModel
+
+    if paths.root is WHOLE or not _same_shape(WidgetModel.unproxy(live), target):
+        return False
+
+    _restore(live, target, paths.root)
+    return True
+
+
+def _restore(live: "WidgetModel", target, node):
+    from ..core.widget.widget_model import WidgetModel
+
+    raw = WidgetModel.unproxy(live)
+    for key, child in node.items():
+        if not _contains(target, key):
+            if isinstance(raw, dict) and key in raw:
+                del live[key]
+        elif (
+            child is WHOLE
+            or not _contains(raw, key)
+            or not _same_shape(WidgetModel.unproxy(raw[key]), target[key])
+        ):
+            live[key] = thaw(target[key])
+        else:
+            _restore(live[key], target[key], child)